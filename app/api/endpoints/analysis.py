@@ -1,22 +1,21 @@
 """页面分析端点"""
 
+import base64
+import os
 import time
-import uuid
+from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Response
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_db
 from app.api.schemas import (
     AnalyzeUrlRequest, AnalysisResponse, TestSelectorsRequest, 
-    TestSelectorsResponse, ErrorResponse
+    TestSelectorsResponse, SelectorTestResult, ErrorResponse
 )
-from app.core.ai.page_analyzer import PageAnalyzer
-from app.core.ai.selector_generator import SelectorGenerator
-from app.core.browser.browser_controller import BrowserController
-from app.models.ai_analysis import AIAnalysisResult
-from app.models.job_site import JobSite
-from app.models.selector_config import SelectorConfig
 from app.services.analysis_service import AnalysisService
 import logging
 
@@ -24,28 +23,103 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 支持的网站列表（示例数据）
+SUPPORTED_SITES = [
+    {
+        "name": "智联招聘",
+        "domain": "zhaopin.com",
+        "status": "supported",
+        "confidence": 0.95
+    },
+    {
+        "name": "前程无忧",
+        "domain": "51job.com",
+        "status": "supported",
+        "confidence": 0.92
+    },
+    {
+        "name": "BOSS直聘",
+        "domain": "zhipin.com",
+        "status": "supported",
+        "confidence": 0.90
+    }
+]
+
+# 选择器模板（数据文件在导入时加载一次）
+_TEMPLATES_PATH = Path(__file__).resolve().parent.parent / "data" / "selector_templates.json"
+SELECTOR_TEMPLATES = MappingProxyType(orjson.loads(_TEMPLATES_PATH.read_bytes()))
+
+# 静态响应在导入时预先序列化，避免每次请求重复编码
+_SITES_RESPONSE = orjson.dumps({
+    "success": True,
+    "sites": SUPPORTED_SITES,
+    "total": len(SUPPORTED_SITES),
+    "message": "支持网站列表查询完成"
+})
+
+_TEMPLATES_RESPONSE = orjson.dumps({
+    "success": True,
+    "templates": dict(SELECTOR_TEMPLATES),
+    "message": "选择器模板查询完成"
+})
+
+# 按域名索引的模板响应
+_DOMAIN_TEMPLATE_RESPONSES = {
+    template["domain"]: orjson.dumps({
+        "success": True,
+        "name": name,
+        "domain": template["domain"],
+        "selectors": template["selectors"],
+        "message": "选择器模板查询完成"
+    })
+    for name, template in SELECTOR_TEMPLATES.items()
+}
+
+# 选择器测试建议模板：无效 / 匹配过多 / 未匹配 / 正常
+_SUGGESTION_TEMPLATES = (
+    "{key}选择器无效，未找到匹配元素",
+    "{key}选择器匹配元素过多({count}个)，建议增加限定条件",
+    "{key}选择器未匹配任何元素，需要调整",
+    None
+)
+
+
+def get_analysis_service(db: AsyncSession = Depends(get_async_db)) -> AnalysisService:
+    """获取页面分析服务 (依赖注入)"""
+    return AnalysisService(db)
+
+
+def _new_session_id() -> str:
+    """生成临时会话ID（仅用于浏览器会话和日志，不入库）"""
+    return base64.urlsafe_b64encode(os.urandom(12)).decode("ascii")
+
 
 @router.post("/analyze-url", response_model=AnalysisResponse)
 async def analyze_url(
     request: AnalyzeUrlRequest,
     background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_async_db)
+    analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """分析URL并生成选择器配置"""
     
-    start_time = time.time()
-    session_id = str(uuid.uuid4())
+    options = request.options or {}
+    if not isinstance(options.get("include_screenshots", False), bool):
+        logger.warning("URL分析参数无效: include_screenshots=%r", options["include_screenshots"])
+        raise HTTPException(
+            status_code=422,
+            detail="分析参数无效: include_screenshots 必须为布尔值"
+        )
+    
+    start_ns = time.perf_counter_ns()
+    session_id = _new_session_id()
     
     try:
-        logger.info(f"开始分析URL: {request.url}")
-        
-        # 创建分析服务
-        analysis_service = AnalysisService(db)
+        logger.info("开始分析URL: %s", request.url)
         
         # 执行页面分析
         result = await analysis_service.analyze_page(
             url=str(request.url),
-            options=request.options,
+            options=options,
             session_id=session_id
         )
         
@@ -55,7 +129,7 @@ async def analyze_url(
                 detail=f"页面分析失败: {result['error']}"
             )
         
-        processing_time = int((time.time() - start_time) * 1000)
+        processing_time = (time.perf_counter_ns() - start_ns) // 1_000_000
         
         # 构建响应
         response = AnalysisResponse(
@@ -74,15 +148,22 @@ async def analyze_url(
             session_id
         )
         
-        logger.info(f"URL分析完成: {request.url}, 耗时: {processing_time}ms")
+        logger.info("URL分析完成: %s, 耗时: %sms", request.url, processing_time)
         
         return response
         
     except HTTPException:
         raise
+    except ValidationError as e:
+        # AI返回的选择器不完整属于可预期的失败，不记录堆栈
+        logger.warning("URL分析结果校验失败: %s", e)
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"分析过程发生异常: {str(e)}"
+        )
     except Exception as e:
-        processing_time = int((time.time() - start_time) * 1000)
-        logger.error(f"URL分析异常: {e}", exc_info=True)
+        logger.exception("URL分析异常: %s", e)
         
         raise HTTPException(
             status_code=500,
@@ -94,11 +175,22 @@ async def analyze_url(
 async def test_selectors(request: TestSelectorsRequest):
     """测试选择器有效性"""
     
+    selectors = request.selectors.model_dump()
+    blank_keys = [key for key, value in selectors.items() if value is not None and not value.strip()]
+    if blank_keys:
+        logger.warning("选择器测试参数无效: 空选择器 %s", blank_keys)
+        raise HTTPException(
+            status_code=422,
+            detail=f"选择器测试参数无效: 选择器不能为空 ({', '.join(blank_keys)})"
+        )
+    
     try:
-        logger.info(f"开始测试选择器: {request.url}")
+        logger.info("开始测试选择器: %s", request.url)
         
         # 创建浏览器控制器
-        session_id = str(uuid.uuid4())
+        session_id = _new_session_id()
+        # 延迟导入，避免Playwright/browser-use拖慢其他端点的冷启动
+        from app.core.browser.browser_controller import BrowserController
         browser_controller = BrowserController()
         
         try:
@@ -112,7 +204,7 @@ async def test_selectors(request: TestSelectorsRequest):
             # 测试选择器
             test_result = await browser_controller.test_selectors(
                 url=str(request.url),
-                selectors=request.selectors.dict()
+                selectors=selectors
             )
             
             if not test_result["success"]:
@@ -121,34 +213,32 @@ async def test_selectors(request: TestSelectorsRequest):
                     detail=f"选择器测试失败: {test_result['error']}"
                 )
             
+            # 测试结果字段与SelectorTestResult一致，缺省字段由模型默认值补齐；
+            # 只校验一次，响应模型直接复用这些实例
+            results = {
+                key: SelectorTestResult.model_validate(result)
+                for key, result in test_result["results"].items()
+            }
+            
             # 生成优化建议
             suggestions = []
-            for key, result in test_result["results"].items():
-                if not result["valid"]:
-                    suggestions.append(f"{key}选择器无效，未找到匹配元素")
-                elif result["count"] > 100:
-                    suggestions.append(f"{key}选择器匹配元素过多({result['count']}个)，建议增加限定条件")
-                elif result["count"] == 0:
-                    suggestions.append(f"{key}选择器未匹配任何元素，需要调整")
+            for key, result in results.items():
+                count = result.count
+                template = _SUGGESTION_TEMPLATES[
+                    0 if not result.valid else 1 if count > 100 else 2 if count == 0 else 3
+                ]
+                if template:
+                    suggestions.append(template.format(key=key, count=count))
             
             response = TestSelectorsResponse(
                 overall_score=test_result["overall_score"],
-                results={
-                    key: {
-                        "selector": result["selector"],
-                        "valid": result["valid"],
-                        "count": result["count"],
-                        "sample_text": result.get("sample_text", ""),
-                        "error": result.get("error")
-                    }
-                    for key, result in test_result["results"].items()
-                },
+                results=results,
                 page_url=str(request.url),
                 suggestions=suggestions,
                 message="选择器测试完成"
             )
             
-            logger.info(f"选择器测试完成: {request.url}")
+            logger.info("选择器测试完成: %s", request.url)
             return response
             
         finally:
@@ -158,7 +248,7 @@ async def test_selectors(request: TestSelectorsRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"选择器测试异常: {e}", exc_info=True)
+        logger.exception("选择器测试异常: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"测试过程发生异常: {str(e)}"
@@ -186,7 +276,7 @@ async def get_analysis_history(
         }
         
     except Exception as e:
-        logger.error(f"查询分析历史异常: {e}", exc_info=True)
+        logger.exception("查询分析历史异常: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"查询历史记录失败: {str(e)}"
@@ -196,92 +286,24 @@ async def get_analysis_history(
 @router.get("/sites")
 async def get_supported_sites(db: AsyncSession = Depends(get_async_db)):
     """获取支持的网站列表"""
-    
-    try:
-        # 从数据库查询已配置的网站
-        # 暂时返回示例数据
-        supported_sites = [
-            {
-                "name": "智联招聘",
-                "domain": "zhaopin.com",
-                "status": "supported",
-                "confidence": 0.95
-            },
-            {
-                "name": "前程无忧",
-                "domain": "51job.com", 
-                "status": "supported",
-                "confidence": 0.92
-            },
-            {
-                "name": "BOSS直聘",
-                "domain": "zhipin.com",
-                "status": "supported", 
-                "confidence": 0.90
-            }
-        ]
-        
-        return {
-            "success": True,
-            "sites": supported_sites,
-            "total": len(supported_sites),
-            "message": "支持网站列表查询完成"
-        }
-        
-    except Exception as e:
-        logger.error(f"查询支持网站异常: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"查询支持网站失败: {str(e)}"
-        )
+    # 从数据库查询已配置的网站
+    # 暂时返回示例数据
+    return Response(content=_SITES_RESPONSE, media_type="application/json")
 
 
 @router.get("/selector-templates")
 async def get_selector_templates():
     """获取选择器模板"""
-    
-    try:
-        templates = {
-            "智联招聘": {
-                "domain": "zhaopin.com",
-                "selectors": {
-                    "jobList": ".positionlist",
-                    "jobItem": ".position-card",
-                    "jobTitle": ".position-title a",
-                    "jobLink": ".position-title a",
-                    "companyName": ".company-name",
-                    "publishedAt": ".publish-time",
-                    "location": ".position-location",
-                    "jobDescription": ".position-summary",
-                    "nextPage": ".pager-next"
-                }
-            },
-            "前程无忧": {
-                "domain": "51job.com",
-                "selectors": {
-                    "jobList": ".j_joblist",
-                    "jobItem": ".j_joblist_item",
-                    "jobTitle": ".job-title a",
-                    "jobLink": ".job-title a",
-                    "companyName": ".comp-name",
-                    "publishedAt": ".job-time",
-                    "location": ".job-area",
-                    "jobDescription": ".job-desc",
-                    "nextPage": ".next"
-                }
-            }
-        }
-        
-        return {
-            "success": True,
-            "templates": templates,
-            "message": "选择器模板查询完成"
-        }
-        
-    except Exception as e:
-        logger.error(f"查询选择器模板异常: {e}", exc_info=True)
+    return Response(content=_TEMPLATES_RESPONSE, media_type="application/json")
+
+
+@router.get("/selector-templates/{domain}")
+async def get_selector_template_by_domain(domain: str):
+    """按域名获取选择器模板"""
+    content = _DOMAIN_TEMPLATE_RESPONSES.get(domain.lower().removeprefix("www."))
+    if content is None:
         raise HTTPException(
-            status_code=500,
-            detail=f"查询选择器模板失败: {str(e)}"
+            status_code=404,
+            detail=f"未找到域名的选择器模板: {domain}"
         )
-
+    return Response(content=content, media_type="application/json")
@@ -1,82 +1,102 @@
 """爬虫任务端点"""
 
-import uuid
 import asyncio
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import csv
+import io
+import time
+import uuid
+from typing import Dict, Any, AsyncIterator, Optional, Set
+import orjson
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_db
+from app.config import get_settings
+from app.database import get_async_db, AsyncSessionLocal
 from app.api.schemas import (
     StartCrawlingRequest, StartCrawlingResponse,
     CrawlStatusResponse, CrawlResultResponse, ErrorResponse
 )
 from app.services.crawling_service import CrawlingService
-from app.core.browser.browser_controller import BrowserController
+from app.services.session_store import session_store
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 存储活动的爬虫会话
-active_sessions: Dict[str, Dict[str, Any]] = {}
+# 限制单个进程内同时运行的爬虫任务数（首次使用时按配置创建，导入模块时不读取配置）
+_crawl_semaphore: Optional[asyncio.Semaphore] = None
+
+# 持有后台任务引用，防止任务在运行中被垃圾回收
+_crawl_tasks: Set[asyncio.Task] = set()
+
+
+def _get_crawl_semaphore() -> asyncio.Semaphore:
+    """获取爬虫任务并发信号量"""
+    global _crawl_semaphore
+    if _crawl_semaphore is None:
+        _crawl_semaphore = asyncio.Semaphore(get_settings().max_concurrent_sessions)
+    return _crawl_semaphore
+
+
+def get_crawling_service(db: AsyncSession = Depends(get_async_db)) -> CrawlingService:
+    """获取爬虫服务 (依赖注入)"""
+    return CrawlingService(db)
 
 
 @router.post("/start", response_model=StartCrawlingResponse)
 async def start_crawling(
     request: StartCrawlingRequest,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_async_db)
+    crawling_service: CrawlingService = Depends(get_crawling_service)
 ):
     """启动爬虫任务"""
     
     session_id = str(uuid.uuid4())
+    url = str(request.url)
+    selectors = request.selectors.model_dump()
+    options = request.options.model_dump()
     
     try:
-        logger.info(f"启动爬虫任务: {request.url}")
-        
-        # 创建爬虫服务
-        crawling_service = CrawlingService(db)
+        logger.info("启动爬虫任务: %s", request.url)
         
         # 创建爬虫会话记录
         session = await crawling_service.create_crawl_session(
-            url=str(request.url),
-            selectors=request.selectors.dict(),
-            options=request.options.dict(),
+            url=url,
+            selectors=selectors,
+            options=options,
             session_id=session_id
         )
         
-        # 添加到活动会话
-        active_sessions[session_id] = {
-            "status": "starting",
-            "session": session,
-            "start_time": asyncio.get_event_loop().time()
-        }
+        estimated_duration = request.options.max_pages * 5  # 估算每页5秒
         
-        # 后台执行爬虫任务
-        background_tasks.add_task(
-            execute_crawling_task,
+        # 添加到活动会话
+        await session_store.create(
             session_id,
-            str(request.url),
-            request.selectors.dict(),
-            request.options.dict(),
-            db
+            status="starting",
+            start_time=time.time(),
+            estimated_duration=estimated_duration
         )
         
+        # 后台执行爬虫任务
+        task = asyncio.create_task(execute_crawling_task(
+            session_id, url, selectors, options
+        ))
+        _crawl_tasks.add(task)
+        task.add_done_callback(_crawl_tasks.discard)
+        
         return StartCrawlingResponse(
             session_id=session_id,
             status="started",
-            estimated_duration=request.options.max_pages * 5,  # 估算每页5秒
+            estimated_duration=estimated_duration,
             message="爬虫任务已启动"
         )
         
     except Exception as e:
-        logger.error(f"启动爬虫任务失败: {e}", exc_info=True)
+        logger.exception("启动爬虫任务失败: %s", e)
         
         # 清理失败的会话
-        if session_id in active_sessions:
-            del active_sessions[session_id]
+        await session_store.delete(session_id)
         
         raise HTTPException(
             status_code=500,
@@ -87,15 +107,16 @@ async def start_crawling(
 @router.get("/status/{session_id}", response_model=CrawlStatusResponse)
 async def get_crawl_status(
     session_id: str,
-    db: AsyncSession = Depends(get_async_db)
+    crawling_service: CrawlingService = Depends(get_crawling_service)
 ):
     """获取爬虫任务状态"""
     
     try:
         # 检查活动会话
-        if session_id not in active_sessions:
+        session_info = await session_store.get(session_id)
+        
+        if session_info is None:
             # 从数据库查询历史会话
-            crawling_service = CrawlingService(db)
             session_data = await crawling_service.get_session_status(session_id)
             
             if not session_data:
@@ -115,27 +136,17 @@ async def get_crawl_status(
                 message="状态查询完成"
             )
         
-        # 活动会话状态
-        session_info = active_sessions[session_id]
-        
         # 计算预估剩余时间
-        elapsed = asyncio.get_event_loop().time() - session_info["start_time"]
-        estimated_remaining = max(0, session_info.get("estimated_duration", 0) - elapsed)
+        elapsed = time.time() - session_info.start_time
+        estimated_remaining = max(0, session_info.estimated_duration - elapsed)
         
         return CrawlStatusResponse(
             session_id=session_id,
-            status=session_info["status"],
-            progress=session_info.get("progress", {
-                "pages_crawled": 0,
-                "jobs_found": 0,
-                "jobs_saved": 0,
-                "current_page_url": None,
-                "errors_count": 0,
-                "success_rate": 0.0
-            }),
-            summary=session_info.get("summary"),
-            export_url=session_info.get("export_url"),
-            errors=session_info.get("errors", []),
+            status=session_info.status,
+            progress=session_info.progress,
+            summary=session_info.summary,
+            export_url=session_info.export_url,
+            errors=session_info.errors,
             estimated_remaining=int(estimated_remaining),
             message="状态查询完成"
         )
@@ -143,7 +154,7 @@ async def get_crawl_status(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"查询爬虫状态失败: {e}", exc_info=True)
+        logger.exception("查询爬虫状态失败: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"查询状态失败: {str(e)}"
@@ -153,17 +164,14 @@ async def get_crawl_status(
 @router.post("/stop/{session_id}")
 async def stop_crawling(
     session_id: str,
-    db: AsyncSession = Depends(get_async_db)
+    crawling_service: CrawlingService = Depends(get_crawling_service)
 ):
     """停止爬虫任务"""
     
     try:
-        if session_id in active_sessions:
-            # 标记会话为取消状态
-            active_sessions[session_id]["status"] = "cancelling"
-            
+        # 标记会话为取消状态（会话不存在时不会写入）
+        if await session_store.update(session_id, status="cancelling"):
             # 更新数据库记录
-            crawling_service = CrawlingService(db)
             await crawling_service.cancel_session(session_id)
             
             return {
@@ -179,7 +187,7 @@ async def stop_crawling(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"停止爬虫任务失败: {e}", exc_info=True)
+        logger.exception("停止爬虫任务失败: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"停止任务失败: {str(e)}"
@@ -191,18 +199,27 @@ async def list_sessions(
     limit: int = 20,
     offset: int = 0,
     status: Optional[str] = None,
-    db: AsyncSession = Depends(get_async_db)
+    crawling_service: CrawlingService = Depends(get_crawling_service)
 ):
     """获取爬虫会话列表"""
     
     try:
-        crawling_service = CrawlingService(db)
         sessions = await crawling_service.list_sessions(
             limit=limit,
             offset=offset,
             status=status
         )
         
+        # 批量合并活动会话的实时状态
+        live_sessions = await session_store.get_many(
+            [item["session_id"] for item in sessions["sessions"]]
+        )
+        for item in sessions["sessions"]:
+            live = live_sessions.get(item["session_id"])
+            if live:
+                item["status"] = live.status
+                item["progress"].update(live.progress)
+        
         return {
             "success": True,
             "sessions": sessions["sessions"],
@@ -213,7 +230,7 @@ async def list_sessions(
         }
         
     except Exception as e:
-        logger.error(f"查询会话列表失败: {e}", exc_info=True)
+        logger.exception("查询会话列表失败: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"查询会话列表失败: {str(e)}"
@@ -224,7 +241,7 @@ async def list_sessions(
 async def export_results(
     session_id: str,
     format: str = "json",
-    db: AsyncSession = Depends(get_async_db)
+    crawling_service: CrawlingService = Depends(get_crawling_service)
 ):
     """导出爬取结果"""
     
@@ -235,7 +252,6 @@ async def export_results(
                 detail="不支持的导出格式，支持: json, csv, excel"
             )
         
-        crawling_service = CrawlingService(db)
         export_result = await crawling_service.export_session_data(
             session_id=session_id,
             format=format
@@ -258,30 +274,103 @@ async def export_results(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"导出结果失败: {e}", exc_info=True)
+        logger.exception("导出结果失败: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"导出失败: {str(e)}"
         )
 
 
+@router.get("/export-stream/{session_id}")
+async def stream_export_results(
+    session_id: str,
+    format: str = "csv",
+    crawling_service: CrawlingService = Depends(get_crawling_service)
+):
+    """流式导出爬取结果"""
+    
+    if format not in ["json", "csv"]:
+        raise HTTPException(
+            status_code=400,
+            detail="流式导出仅支持: json, csv"
+        )
+    
+    # 开始流式响应后无法再返回错误状态码，先确认会话存在
+    if not await crawling_service.session_exists(session_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"会话未找到: {session_id}"
+        )
+    
+    media_type = "application/x-ndjson" if format == "json" else "text/csv"
+    extension = "ndjson" if format == "json" else "csv"
+    
+    return StreamingResponse(
+        _stream_export_rows(session_id, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="jobs_{session_id}.{extension}"'
+        }
+    )
+
+
+async def _stream_export_rows(session_id: str, format: str) -> AsyncIterator[bytes]:
+    """逐行编码导出数据，内存占用与数据总量无关"""
+    
+    # 响应发送期间请求级依赖可能已释放，这里使用独立的数据库会话
+    async with AsyncSessionLocal() as db:
+        rows = CrawlingService(db).iter_session_rows(session_id)
+        
+        if format == "json":
+            async for row in rows:
+                yield orjson.dumps(row) + b"\n"
+            return
+        
+        buffer = io.StringIO()
+        writer = None
+        async for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+
 async def execute_crawling_task(
     session_id: str,
     url: str,
     selectors: Dict[str, str],
-    options: Dict[str, Any],
-    db: AsyncSession
+    options: Dict[str, Any]
 ):
     """执行爬虫任务（后台任务）"""
     
+    # 超出并发上限的任务保持starting状态排队，并使用独立的数据库会话
+    async with _get_crawl_semaphore():
+        async with AsyncSessionLocal() as db:
+            await _run_crawling_task(
+                session_id, url, selectors, options, CrawlingService(db)
+            )
+
+
+async def _run_crawling_task(
+    session_id: str,
+    url: str,
+    selectors: Dict[str, str],
+    options: Dict[str, Any],
+    crawling_service: CrawlingService
+):
+    """执行爬取并记录结果"""
+    
     try:
-        logger.info(f"开始执行爬虫任务: {session_id}")
+        logger.info("开始执行爬虫任务: %s", session_id)
         
         # 更新会话状态
-        if session_id in active_sessions:
-            active_sessions[session_id]["status"] = "running"
+        await session_store.update(session_id, status="running")
         
-        # 创建浏览器控制器
+        # 创建浏览器控制器（延迟导入，避免Playwright/browser-use拖慢冷启动）
+        from app.core.browser.browser_controller import BrowserController
         browser_controller = BrowserController()
         
         try:
@@ -293,12 +382,10 @@ async def execute_crawling_task(
             crawl_result = await browser_controller.crawl_jobs(
                 url=url,
                 selectors=selectors,
-                max_pages=options.get("max_pages", 10)
+                max_pages=options.get("max_pages", 10),
+                include_raw_html=options.get("include_raw_html", False)
             )
             
-            # 创建爬虫服务处理结果
-            crawling_service = CrawlingService(db)
-            
             if crawl_result.success:
                 # 保存爬取结果
                 await crawling_service.save_crawl_results(
@@ -308,19 +395,19 @@ async def execute_crawling_task(
                 )
                 
                 # 更新会话状态
-                if session_id in active_sessions:
-                    active_sessions[session_id].update({
-                        "status": "completed",
-                        "progress": {
-                            "pages_crawled": crawl_result.pages_crawled,
-                            "jobs_found": len(crawl_result.jobs),
-                            "jobs_saved": len(crawl_result.jobs),
-                            "errors_count": len(crawl_result.errors),
-                            "success_rate": 1.0 if crawl_result.success else 0.0
-                        }
-                    })
+                await session_store.finish(
+                    session_id,
+                    status="completed",
+                    progress={
+                        "pages_crawled": crawl_result.pages_crawled,
+                        "jobs_found": len(crawl_result.jobs),
+                        "jobs_saved": len(crawl_result.jobs),
+                        "errors_count": len(crawl_result.errors),
+                        "success_rate": 1.0 if crawl_result.success else 0.0
+                    }
+                )
                 
-                logger.info(f"爬虫任务完成: {session_id}, 获取 {len(crawl_result.jobs)} 个职位")
+                logger.info("爬虫任务完成: %s, 获取 %s 个职位", session_id, len(crawl_result.jobs))
             else:
                 # 处理失败情况
                 await crawling_service.handle_crawl_failure(
@@ -328,41 +415,34 @@ async def execute_crawling_task(
                     errors=crawl_result.errors
                 )
                 
-                if session_id in active_sessions:
-                    active_sessions[session_id].update({
-                        "status": "failed",
-                        "errors": crawl_result.errors
-                    })
+                await session_store.finish(
+                    session_id,
+                    status="failed",
+                    errors=crawl_result.errors
+                )
                 
-                logger.error(f"爬虫任务失败: {session_id}, 错误: {crawl_result.errors}")
+                logger.error("爬虫任务失败: %s, 错误: %s", session_id, crawl_result.errors)
         
         finally:
             # 清理浏览器资源
             await browser_controller.cleanup()
     
     except Exception as e:
-        logger.error(f"执行爬虫任务异常: {e}", exc_info=True)
+        logger.exception("执行爬虫任务异常: %s", e)
         
         # 更新失败状态
-        if session_id in active_sessions:
-            active_sessions[session_id].update({
-                "status": "failed",
-                "errors": [str(e)]
-            })
+        await session_store.finish(
+            session_id,
+            status="failed",
+            errors=[str(e)]
+        )
         
         # 在数据库中记录失败
         try:
-            crawling_service = CrawlingService(db)
             await crawling_service.handle_crawl_failure(
                 session_id=session_id,
                 errors=[str(e)]
             )
         except Exception as db_error:
-            logger.error(f"记录爬虫失败状态时出错: {db_error}")
-    
-    finally:
-        # 从活动会话中移除（延迟移除，给状态查询一些时间）
-        await asyncio.sleep(300)  # 5分钟后移除
-        if session_id in active_sessions:
-            del active_sessions[session_id]
+            logger.error("记录爬虫失败状态时出错: %s", db_error)
 
@@ -1,6 +1,8 @@
 """健康检查端点"""
 
-from fastapi import APIRouter, Depends
+import asyncio
+import orjson
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_async_db, db_manager
 import logging
@@ -9,6 +11,15 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 静态响应在导入时预先序列化
+_PING_RESPONSE = orjson.dumps({"message": "pong"})
+
+_VERSION_RESPONSE = orjson.dumps({
+    "service": "AI Crawler Assistant",
+    "version": "1.0.0",
+    "description": "AI驱动的招聘网站智能爬虫工具"
+})
+
 
 @router.get("/status")
 async def health_status(db: AsyncSession = Depends(get_async_db)):
@@ -19,31 +30,34 @@ async def health_status(db: AsyncSession = Depends(get_async_db)):
         "components": {}
     }
     
-    # 检查数据库连接
-    try:
-        db_status = await db_manager.check_connection()
+    # 并发检查数据库和Redis连接
+    db_status, redis_status = await asyncio.gather(
+        db_manager.check_connection(),
+        db_manager.check_redis_connection(),
+        return_exceptions=True
+    )
+    
+    if isinstance(db_status, Exception):
+        status["components"]["database"] = {
+            "status": "unhealthy",
+            "error": str(db_status)
+        }
+    else:
         status["components"]["database"] = {
             "status": "healthy" if db_status else "unhealthy",
             "details": "PostgreSQL connection"
         }
-    except Exception as e:
-        status["components"]["database"] = {
+    
+    if isinstance(redis_status, Exception):
+        status["components"]["redis"] = {
             "status": "unhealthy",
-            "error": str(e)
+            "error": str(redis_status)
         }
-    
-    # 检查Redis连接
-    try:
-        redis_status = await db_manager.check_redis_connection()
+    else:
         status["components"]["redis"] = {
             "status": "healthy" if redis_status else "unhealthy",
             "details": "Redis connection"
         }
-    except Exception as e:
-        status["components"]["redis"] = {
-            "status": "unhealthy",
-            "error": str(e)
-        }
     
     # 检查整体状态
     unhealthy_components = [
@@ -61,15 +75,11 @@ async def health_status(db: AsyncSession = Depends(get_async_db)):
 @router.get("/ping")
 async def ping():
     """简单的ping检查"""
-    return {"message": "pong"}
+    return Response(content=_PING_RESPONSE, media_type="application/json")
 
 
 @router.get("/version")
 async def version():
     """版本信息"""
-    return {
-        "service": "AI Crawler Assistant",
-        "version": "1.0.0",
-        "description": "AI驱动的招聘网站智能爬虫工具"
-    }
+    return Response(content=_VERSION_RESPONSE, media_type="application/json")
 
@@ -2,7 +2,7 @@
 
 from typing import Dict, List, Any, Optional
 from datetime import datetime
-from pydantic import BaseModel, Field, HttpUrl, validator
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 
 
 # 基础响应模式
@@ -20,23 +20,19 @@ class ErrorResponse(BaseResponse):
     details: Optional[Dict[str, Any]] = None
 
 
+class BaseRequest(BaseModel):
+    """基础请求模式"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+
 # 页面分析相关模式
-class AnalyzeUrlRequest(BaseModel):
+class AnalyzeUrlRequest(BaseRequest):
     """分析URL请求"""
     url: HttpUrl = Field(..., description="要分析的招聘页面URL")
     options: Optional[Dict[str, Any]] = Field(default_factory=dict, description="分析选项")
-    
-    @validator('url')
-    def validate_url(cls, v):
-        """验证URL格式"""
-        url_str = str(v)
-        if not any(domain in url_str for domain in ['job', 'career', 'work', 'recruit', 'zhipin', 'liepin']):
-            # 这里只是提醒，不强制限制
-            pass
-        return v
-
-
-class SelectorConfig(BaseModel):
+
+
+class SelectorConfig(BaseRequest):
     """选择器配置"""
     jobList: str = Field(..., description="职位列表容器选择器")
     jobItem: str = Field(..., description="单个职位项选择器")
@@ -60,17 +56,18 @@ class AnalysisResponse(BaseResponse):
 
 
 # 爬虫任务相关模式
-class CrawlOptions(BaseModel):
+class CrawlOptions(BaseRequest):
     """爬虫选项"""
     max_pages: int = Field(10, ge=1, le=100, description="最大爬取页数")
     delay_between_pages: float = Field(2.0, ge=0.5, le=10.0, description="页面间延迟(秒)")
     export_format: str = Field("json", pattern="^(json|csv|excel)$", description="导出格式")
     data_filters: Optional[Dict[str, Any]] = Field(default_factory=dict, description="数据过滤器")
     enable_screenshots: bool = Field(False, description="是否启用截图")
+    include_raw_html: bool = Field(False, description="是否保存职位原始HTML")
     quality_threshold: float = Field(0.7, ge=0.0, le=1.0, description="数据质量阈值")
 
 
-class StartCrawlingRequest(BaseModel):
+class StartCrawlingRequest(BaseRequest):
     """开始爬取请求"""
     url: HttpUrl = Field(..., description="起始URL")
     selectors: SelectorConfig = Field(..., description="选择器配置")
@@ -147,7 +144,7 @@ class CrawlResultResponse(BaseResponse):
 
 
 # 测试相关模式
-class TestSelectorsRequest(BaseModel):
+class TestSelectorsRequest(BaseRequest):
     """测试选择器请求"""
     url: HttpUrl = Field(..., description="测试页面URL")
     selectors: SelectorConfig = Field(..., description="选择器配置")
@@ -1,6 +1,7 @@
 """配置管理模块"""
 
 import os
+from functools import cached_property, lru_cache
 from typing import Optional, List
 from pydantic_settings import BaseSettings
 from pydantic import Field
@@ -18,17 +19,22 @@ class Settings(BaseSettings):
     # 数据库配置
     database_url: str = Field(env="DATABASE_URL")
     redis_url: str = Field(env="REDIS_URL")
+    db_pool_size: int = Field(default=20, env="DB_POOL_SIZE")  # 约为并发任务数的2倍
+    db_max_overflow: int = Field(default=20, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=10.0, env="DB_POOL_TIMEOUT")
     
     # OpenAI配置
     openai_api_key: str = Field(env="OPENAI_API_KEY")
     openai_model: str = Field(default="gpt-4-vision-preview", env="OPENAI_MODEL")
     openai_base_url: str = Field(default="https://api.openai.com/v1", env="OPENAI_BASE_URL")
+    openai_stream_responses: bool = Field(default=False, env="OPENAI_STREAM_RESPONSES")
     
     # Browser配置
     browser_headless: bool = Field(default=True, env="BROWSER_HEADLESS")
     browser_timeout: int = Field(default=30000, env="BROWSER_TIMEOUT")
     browser_viewport_width: int = Field(default=1920, env="BROWSER_VIEWPORT_WIDTH")
     browser_viewport_height: int = Field(default=1080, env="BROWSER_VIEWPORT_HEIGHT")
+    block_heavy_resources: bool = Field(default=True, env="BLOCK_HEAVY_RESOURCES")
     
     # 代理配置
     proxy_enabled: bool = Field(default=False, env="PROXY_ENABLED")
@@ -51,20 +57,22 @@ class Settings(BaseSettings):
     upload_dir: str = Field(default="uploads", env="UPLOAD_DIR")
     export_dir: str = Field(default="exports", env="EXPORT_DIR")
     screenshot_dir: str = Field(default="screenshots", env="SCREENSHOT_DIR")
+    screenshot_full_page: bool = Field(default=False, env="SCREENSHOT_FULL_PAGE")
     
     # 性能配置
     max_concurrent_sessions: int = Field(default=5, env="MAX_CONCURRENT_SESSIONS")
     max_pages_per_session: int = Field(default=100, env="MAX_PAGES_PER_SESSION")
-    request_delay_min: int = Field(default=1, env="REQUEST_DELAY_MIN")
-    request_delay_max: int = Field(default=3, env="REQUEST_DELAY_MAX")
+    max_concurrent_pages: int = Field(default=3, env="MAX_CONCURRENT_PAGES")
+    requests_per_period: int = Field(default=3, env="REQUESTS_PER_PERIOD")
+    rate_period_seconds: float = Field(default=5.0, env="RATE_PERIOD_SECONDS")
     
     class Config:
         env_file = ".env"
         case_sensitive = False
     
-    @property
+    @cached_property
     def proxy_list_parsed(self) -> List[str]:
-        """解析代理列表"""
+        """解析代理列表（首次访问时解析并缓存）"""
         if not self.proxy_list:
             return []
         return [proxy.strip() for proxy in self.proxy_list.split(",")]
@@ -78,14 +86,40 @@ class Settings(BaseSettings):
         return self.redis_url
 
 
-# 全局配置实例
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """获取全局配置实例（首次调用时解析环境变量并缓存）"""
+    return Settings()
+
+
+def __getattr__(name: str):
+    """兼容 ``from app.config import settings``，按需创建全局配置"""
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class BrowserConfig:
     """浏览器配置类"""
     
+    # 启动参数只取决于stealth_mode，预先构造两种组合
+    _BASE_ARGS: tuple = (
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-blink-features=AutomationControlled",
+        "--disable-extensions",
+        "--disable-plugins",
+        "--disable-images",  # 禁用图片加载以提高性能
+        "--disable-javascript",  # 可选：禁用JS（如果不需要）
+    )
+    _STEALTH_ARGS: tuple = _BASE_ARGS + (
+        "--disable-web-security",
+        "--disable-features=VizDisplayCompositor",
+        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    )
+    
     def __init__(self):
+        settings = get_settings()
         self.headless = settings.browser_headless
         self.timeout = settings.browser_timeout
         self.viewport = {
@@ -95,41 +129,21 @@ class BrowserConfig:
         self.stealth_mode = settings.enable_stealth_mode
         
     def get_launch_options(self) -> dict:
-        """获取浏览器启动选项"""
-        options = {
+        """获取浏览器启动选项（args为共享的只读元组，需修改时由调用方复制）"""
+        return {
             "headless": self.headless,
             "viewport": self.viewport,
-            "args": [
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-blink-features=AutomationControlled",
-                "--disable-extensions",
-                "--disable-plugins",
-                "--disable-images",  # 禁用图片加载以提高性能
-                "--disable-javascript",  # 可选：禁用JS（如果不需要）
-            ]
+            "args": self._STEALTH_ARGS if self.stealth_mode else self._BASE_ARGS
         }
-        
-        if self.stealth_mode:
-            options["args"].extend([
-                "--disable-web-security",
-                "--disable-features=VizDisplayCompositor",
-                "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            ])
-            
-        return options
 
 
 class CrawlConfig:
     """爬虫配置类"""
     
     def __init__(self):
+        settings = get_settings()
         self.max_pages = settings.max_pages_per_session
-        self.delay_min = settings.request_delay_min
-        self.delay_max = settings.request_delay_max
+        self.requests_per_period = settings.requests_per_period
+        self.rate_period_seconds = settings.rate_period_seconds
         self.timeout = settings.browser_timeout
-        
-    def get_random_delay(self) -> tuple:
-        """获取随机延迟范围"""
-        return (self.delay_min, self.delay_max)
 
@@ -1,23 +1,183 @@
 """页面分析器"""
 
+import asyncio
 import base64
-import json
 import logging
+import os
 import time
+import weakref
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from io import BytesIO
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from bs4 import BeautifulSoup
-from openai import AsyncOpenAI
+import orjson
+import soupsieve
+from bs4 import BeautifulSoup, Comment, Tag
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 from app.config import settings
 from app.core.ai.prompt_templates import PromptTemplates
 
 logger = logging.getLogger(__name__)
 
+# 框架特征选择器（React / Vue.js / Angular / jQuery）
+FRAMEWORK_MARKERS_SELECTOR = (
+    "[data-reactroot], #root, [data-v-], [v-cloak], [ng-app], [ng-controller], "
+    'script[src*="jquery" i]'
+)
+FRAMEWORK_ORDER = ("React", "Vue.js", "Angular", "jQuery")
 
-@dataclass
+# HTML解析器后端（C实现的lxml，比纯Python的html.parser快数倍）
+HTML_PARSER = 'lxml'
+
+# 原始HTML超过该长度时先截断再解析（清理后的内容最终也只保留前80000字符）
+RAW_HTML_PARSE_LIMIT = 200000
+RAW_HTML_CUT_POSITION = 180000
+
+# 清理后的HTML超过该长度时只保留前80000字符（OpenAI有token限制）
+CLEANED_HTML_LIMIT = 100000
+CLEANED_HTML_CUT_POSITION = 80000
+CLEANED_HTML_TRUNCATED_MARK = "\n<!-- 内容被截断 -->"
+
+# 截图base64编码的文件头与MIME类型（截图默认为JPEG）
+SCREENSHOT_MIME_PREFIXES = (
+    ("/9j/", "image/jpeg"),
+    ("iVBOR", "image/png"),
+    ("UklGR", "image/webp"),
+)
+DEFAULT_SCREENSHOT_MIME_TYPE = "image/jpeg"
+
+# 序列化时标记body内容位置的占位符
+_BODY_PLACEHOLDER = "\x00__body_contents__\x00"
+
+# 分析前需要移除的标签
+REMOVABLE_TAGS = frozenset(('script', 'style', 'noscript', 'iframe'))
+
+# 语义化标签
+SEMANTIC_TAGS = ('header', 'nav', 'main', 'section', 'article', 'aside', 'footer')
+
+
+@lru_cache(maxsize=1024)
+def compile_selector(selector: str) -> soupsieve.SoupSieve:
+    """编译CSS选择器（同一选择器在进程内只解析一次）"""
+    return soupsieve.compile(selector)
+
+
+def _truncate_raw_html(html_content: str) -> str:
+    """超长HTML在标签边界处截断，避免解析最终会被丢弃的内容"""
+    if len(html_content) <= RAW_HTML_PARSE_LIMIT:
+        return html_content
+
+    cut = html_content.rfind('<', 0, RAW_HTML_CUT_POSITION)
+    if cut <= 0:
+        cut = RAW_HTML_CUT_POSITION
+    # 未闭合的标签由解析器自动补全
+    return html_content[:cut]
+
+
+def _serialize_bounded(soup: BeautifulSoup) -> str:
+    """序列化清理后的文档，超出长度上限时只序列化到截断位置为止
+
+    body的子节点逐个序列化并累计长度，一旦确定整体超过上限即停止，
+    结果与完整序列化后再截断完全一致。
+    """
+    body = soup.body
+    if body is None:
+        cleaned_html = soup.decode(formatter="minimal")
+        if len(cleaned_html) > CLEANED_HTML_LIMIT:
+            return cleaned_html[:CLEANED_HTML_CUT_POSITION] + CLEANED_HTML_TRUNCATED_MARK
+        return cleaned_html
+
+    # 用占位符替换body内容，得到body之前与之后的部分
+    children = list(body.contents)
+    body.clear()
+    body.append(_BODY_PLACEHOLDER)
+    prefix, suffix = soup.decode(formatter="minimal").split(_BODY_PLACEHOLDER, 1)
+    body.clear()
+    body.extend(children)
+
+    parts = [prefix]
+    length = len(prefix)
+    for child in children:
+        if isinstance(child, Tag):
+            part = child.decode(formatter="minimal")
+        else:
+            part = child.output_ready(formatter="minimal")
+        parts.append(part)
+        length += len(part)
+        if length >= CLEANED_HTML_CUT_POSITION and length + len(suffix) > CLEANED_HTML_LIMIT:
+            # 已确定超出上限，剩余节点不再序列化
+            return "".join(parts)[:CLEANED_HTML_CUT_POSITION] + CLEANED_HTML_TRUNCATED_MARK
+
+    parts.append(suffix)
+    cleaned_html = "".join(parts)
+    if len(cleaned_html) > CLEANED_HTML_LIMIT:
+        return cleaned_html[:CLEANED_HTML_CUT_POSITION] + CLEANED_HTML_TRUNCATED_MARK
+    return cleaned_html
+
+
+def _guess_screenshot_mime_type(screenshot_base64: str) -> str:
+    """根据base64编码的文件头判断截图的MIME类型"""
+    for prefix, mime_type in SCREENSHOT_MIME_PREFIXES:
+        if screenshot_base64.startswith(prefix):
+            return mime_type
+    return DEFAULT_SCREENSHOT_MIME_TYPE
+
+
+# HTML解析进程池，由应用生命周期创建与关闭；未启动时在线程中解析
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_parse_pool() -> None:
+    """创建HTML解析进程池（应用启动时调用）"""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+
+def shutdown_parse_pool() -> None:
+    """关闭HTML解析进程池（应用关闭时调用）"""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool = None
+
+
+# 每个事件循环一个OpenAI客户端（连接池绑定创建它的事件循环），事件循环结束后自动释放
+_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """获取当前事件循环共享的OpenAI客户端（连接池在所有分析器间复用），须在事件循环中调用"""
+    loop = asyncio.get_running_loop()
+    client = _openai_clients.get(loop)
+    if client is None:
+        try:
+            # 安装 openai[aiohttp] 时使用aiohttp传输，高并发下吞吐明显优于httpx默认传输
+            from openai import DefaultAioHttpClient
+            http_client = DefaultAioHttpClient()
+        except (ImportError, RuntimeError):
+            # 保留SDK默认的超时、连接数限制与重定向设置
+            http_client = DefaultAsyncHttpxClient()
+        client = _openai_clients[loop] = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=http_client
+        )
+    return client
+
+
+async def close_openai_client() -> None:
+    """关闭当前事件循环的OpenAI客户端（应用关闭时调用）"""
+    client = _openai_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+@dataclass(slots=True)
 class AnalysisResult:
     """分析结果数据类"""
     html_content: str
@@ -27,7 +187,7 @@ class AnalysisResult:
     processing_time_ms: int
 
 
-@dataclass
+@dataclass(slots=True)
 class AIAnalysisResponse:
     """AI分析响应数据类"""
     confidence_score: float
@@ -40,31 +200,45 @@ class AIAnalysisResponse:
 class PageAnalyzer:
     """页面分析器"""
 
-    def __init__(self):
-        self.openai_client = AsyncOpenAI(
-            api_key=settings.openai_api_key, base_url=settings.openai_base_url)
+    def __init__(self, stream_responses: bool = False):
         self.model = settings.openai_model
+        # 流式接收时边生成边累积响应，长输出无需等待完整响应体
+        self.stream_responses = stream_responses
+
+    @property
+    def openai_client(self) -> AsyncOpenAI:
+        """当前事件循环共享的OpenAI客户端（分析器可在事件循环外创建）"""
+        return get_openai_client()
 
     async def analyze_page_structure(self, url: str, html_content: str,
-                                     screenshot: Optional[bytes] = None) -> AIAnalysisResponse:
-        """分析页面结构"""
+                                     screenshot: Optional[bytes] = None,
+                                     screenshot_base64: Optional[str] = None,
+                                     screenshot_mime_type: Optional[str] = None) -> AIAnalysisResponse:
+        """分析页面结构（已有base64截图时传入screenshot_base64可免去重复编码，
+        未指定screenshot_mime_type时按文件头判断）"""
         start_time = time.time()
 
         try:
-            # 解析HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # 准备分析上下文
-            analysis_context = self._prepare_analysis_context(soup, url)
+            # 解析与清理HTML为CPU密集操作，交给进程池执行（进程池未启动时放到线程中，不阻塞事件循环）
+            if _parse_pool is not None:
+                cleaned_html, analysis_context = await asyncio.get_running_loop().run_in_executor(
+                    _parse_pool, _parse_and_clean, html_content, url
+                )
+            else:
+                cleaned_html, analysis_context = await asyncio.to_thread(
+                    _parse_and_clean, html_content, url
+                )
 
             # 构建提示
             prompt = PromptTemplates.get_page_analysis_prompt(
-                html_content=self._clean_html_for_analysis(html_content),
+                html_content=cleaned_html,
                 additional_context=analysis_context
             )
 
             # 调用AI分析
-            ai_response = await self._call_openai_analysis(prompt, screenshot)
+            ai_response = await self._call_openai_analysis(
+                prompt, screenshot, screenshot_base64=screenshot_base64,
+                screenshot_mime_type=screenshot_mime_type)
 
             # 解析AI响应
             analysis_response = self._parse_ai_response(ai_response)
@@ -82,7 +256,25 @@ class PageAnalyzer:
             logger.error(f"页面分析失败: {e}")
             raise
 
-    def _prepare_analysis_context(self, soup: BeautifulSoup, url: str) -> str:
+    async def analyze_pages_batch(self, pages: List[Dict[str, Any]],
+                                  concurrency: Optional[int] = None) -> List[Any]:
+        """并发分析多个页面
+
+        每项为 analyze_page_structure 的关键字参数；返回结果与输入顺序一致，
+        单页失败时对应位置为异常对象。
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.max_concurrent_sessions)
+
+        async def _analyze_one(page: Dict[str, Any]) -> AIAnalysisResponse:
+            async with semaphore:
+                return await self.analyze_page_structure(**page)
+
+        return await asyncio.gather(
+            *(_analyze_one(page) for page in pages), return_exceptions=True
+        )
+
+    @staticmethod
+    def _prepare_analysis_context(soup: BeautifulSoup, url: str) -> str:
         """准备分析上下文"""
         context_parts = []
 
@@ -95,7 +287,7 @@ class PageAnalyzer:
             context_parts.append(f"页面标题: {title.get_text().strip()}")
 
         # 主要框架检测
-        framework_info = self._detect_framework(soup)
+        framework_info = PageAnalyzer._detect_framework(soup)
         if framework_info:
             context_parts.append(f"检测到的框架: {framework_info}")
 
@@ -112,55 +304,59 @@ class PageAnalyzer:
 
         return "\n".join(context_parts)
 
-    def _detect_framework(self, soup: BeautifulSoup) -> Optional[str]:
+    @staticmethod
+    def _detect_framework(soup: BeautifulSoup) -> Optional[str]:
         """检测页面使用的框架"""
-        frameworks = []
-
-        # React检测
-        if soup.find(attrs={'data-reactroot': True}) or soup.find(id='root'):
-            frameworks.append("React")
-
-        # Vue检测
-        if soup.find(attrs={'data-v-': True}) or soup.find('[v-cloak]'):
-            frameworks.append("Vue.js")
-
-        # Angular检测
-        if soup.find(attrs={'ng-app': True}) or soup.find('[ng-controller]'):
-            frameworks.append("Angular")
-
-        # jQuery检测
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.get('src') and 'jquery' in script.get('src', '').lower():
-                frameworks.append("jQuery")
+        detected = set()
+
+        # 单次选择器查询匹配所有框架特征，再按元素归类
+        for element in soup.select(FRAMEWORK_MARKERS_SELECTOR):
+            # 同一元素可能带有多个框架特征，逐项判断
+            if element.name == 'script' and 'jquery' in element.get('src', '').lower():
+                detected.add("jQuery")
+            if element.has_attr('data-reactroot') or element.get('id') == 'root':
+                detected.add("React")
+            if element.has_attr('data-v-') or element.has_attr('v-cloak'):
+                detected.add("Vue.js")
+            if element.has_attr('ng-app') or element.has_attr('ng-controller'):
+                detected.add("Angular")
+
+            # 已检测到全部框架时提前结束
+            if len(detected) == len(FRAMEWORK_ORDER):
                 break
 
+        frameworks = [name for name in FRAMEWORK_ORDER if name in detected]
         return ", ".join(frameworks) if frameworks else None
 
-    def _clean_html_for_analysis(self, html_content: str) -> str:
-        """清理HTML内容用于分析"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 移除不需要的标签
-        for tag in soup(['script', 'style', 'noscript', 'iframe']):
-            tag.decompose()
-
-        # 移除注释
-        from bs4 import Comment
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+    @staticmethod
+    def _clean_html_for_analysis(html: Union[str, BeautifulSoup]) -> str:
+        """清理HTML内容用于分析（传入已解析的soup时原地修改）"""
+        if isinstance(html, BeautifulSoup):
+            soup = html
+        else:
+            soup = BeautifulSoup(_truncate_raw_html(html), HTML_PARSER)
+
+        # 单次遍历同时收集注释与不需要的标签
+        comments = []
+        removable_tags = []
+        for node in soup.descendants:
+            if isinstance(node, Comment):
+                comments.append(node)
+            elif node.name in REMOVABLE_TAGS:
+                removable_tags.append(node)
+
+        # 先移除注释（可能位于待删除标签内部），再删除标签
+        for comment in comments:
             comment.extract()
+        for tag in removable_tags:
+            tag.decompose()
 
-        # 压缩空白字符
-        cleaned_html = str(soup)
-
-        # 限制长度（OpenAI有token限制）
-        if len(cleaned_html) > 100000:  # 约100KB
-            # 保留前80%的内容
-            cleaned_html = cleaned_html[:80000] + "\n<!-- 内容被截断 -->"
-
-        return cleaned_html
+        # 序列化并限制长度（超长时不序列化截断位置之后的内容）
+        return _serialize_bounded(soup)
 
-    async def _call_openai_analysis(self, prompt: str, screenshot: Optional[bytes] = None) -> str:
+    async def _call_openai_analysis(self, prompt: str, screenshot: Optional[bytes] = None,
+                                    screenshot_base64: Optional[str] = None,
+                                    screenshot_mime_type: Optional[str] = None) -> str:
         """调用OpenAI API进行分析"""
         messages = [
             {
@@ -172,26 +368,38 @@ class PageAnalyzer:
         ]
 
         # 如果有截图，添加到消息中
-        if screenshot:
-            screenshot_base64 = base64.b64encode(screenshot).decode('utf-8')
+        if screenshot_base64 is None and screenshot:
+            screenshot_base64 = base64.b64encode(screenshot).decode('ascii')
+        if screenshot_base64:
+            mime_type = screenshot_mime_type or _guess_screenshot_mime_type(screenshot_base64)
             messages[0]["content"].append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/png;base64,{screenshot_base64}",
+                    "url": f"data:{mime_type};base64,{screenshot_base64}",
                     "detail": "high"
                 }
             })
 
-        try:
-            response = await self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=4000,
-                temperature=0.1,  # 较低的温度以获得更一致的结果
-                response_format={"type": "json_object"}
-            )
+        request_kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": 4000,
+            "temperature": 0.1,  # 较低的温度以获得更一致的结果
+            "response_format": {"type": "json_object"}
+        }
 
-            return response.choices[0].message.content
+        try:
+            if not self.stream_responses:
+                response = await self.openai_client.chat.completions.create(**request_kwargs)
+                return response.choices[0].message.content
+
+            stream = await self.openai_client.chat.completions.create(
+                **request_kwargs, stream=True)
+            parts = []
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+            return "".join(parts)
 
         except Exception as e:
             logger.error(f"OpenAI API调用失败: {e}")
@@ -200,7 +408,7 @@ class PageAnalyzer:
     def _parse_ai_response(self, ai_response: str) -> AIAnalysisResponse:
         """解析AI响应"""
         try:
-            data = json.loads(ai_response)
+            data = orjson.loads(ai_response)
 
             return AIAnalysisResponse(
                 confidence_score=data.get('confidence_score', 0.0),
@@ -210,7 +418,7 @@ class PageAnalyzer:
                 processing_time_ms=0  # 将在外部设置
             )
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"AI响应解析失败: {e}")
             # 返回默认响应
             return AIAnalysisResponse(
@@ -223,8 +431,13 @@ class PageAnalyzer:
 
     async def validate_selectors(self, selectors: Dict[str, str], html_content: str) -> Dict[str, Any]:
         """验证选择器有效性"""
+        # 解析与选择器匹配均为CPU密集操作，放到线程池中执行以免阻塞事件循环
+        return await asyncio.to_thread(self._validate_selectors_sync, selectors, html_content)
+
+    def _validate_selectors_sync(self, selectors: Dict[str, str], html_content: str) -> Dict[str, Any]:
+        """同步验证选择器有效性"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = BeautifulSoup(html_content, HTML_PARSER)
             validation_result = {
                 "overall_score": 0.0,
                 "selector_results": {},
@@ -234,30 +447,37 @@ class PageAnalyzer:
             total_selectors = len(selectors)
             valid_selectors = 0
 
-            for key, selector in selectors.items():
-                try:
-                    elements = soup.select(selector)
-                    count = len(elements)
-
-                    # 判断选择器是否有效
-                    is_valid = count > 0
-                    if is_valid:
-                        valid_selectors += 1
+            # 相同的选择器字符串（不同字段共用时）在页面上只匹配一次
+            match_counts: Dict[str, Union[int, Exception]] = {}
 
-                    validation_result["selector_results"][key] = {
-                        "valid": is_valid,
-                        "count": count,
-                        "selector": selector,
-                        "notes": f"找到{count}个元素" if count > 0 else "未找到元素"
-                    }
-
-                except Exception as e:
+            for key, selector in selectors.items():
+                if selector not in match_counts:
+                    try:
+                        match_counts[selector] = len(compile_selector(selector).select(soup))
+                    except Exception as e:
+                        match_counts[selector] = e
+
+                count = match_counts[selector]
+                if isinstance(count, Exception):
                     validation_result["selector_results"][key] = {
                         "valid": False,
                         "count": 0,
                         "selector": selector,
-                        "notes": f"选择器错误: {str(e)}"
+                        "notes": f"选择器错误: {str(count)}"
                     }
+                    continue
+
+                # 判断选择器是否有效
+                is_valid = count > 0
+                if is_valid:
+                    valid_selectors += 1
+
+                validation_result["selector_results"][key] = {
+                    "valid": is_valid,
+                    "count": count,
+                    "selector": selector,
+                    "notes": f"找到{count}个元素" if count > 0 else "未找到元素"
+                }
 
             # 计算整体评分
             validation_result["overall_score"] = valid_selectors / \
@@ -285,45 +505,53 @@ class PageAnalyzer:
 
     def extract_page_features(self, soup: BeautifulSoup) -> Dict[str, Any]:
         """提取页面特征"""
+        # 单次遍历DOM，标签与类名计数在同一循环中完成
+        tag_counts, class_counts = self._count_tags_and_classes(soup)
+
         features = {
-            "total_elements": len(soup.find_all()),
-            "div_count": len(soup.find_all('div')),
-            "link_count": len(soup.find_all('a')),
-            "image_count": len(soup.find_all('img')),
-            "form_count": len(soup.find_all('form')),
-            "table_count": len(soup.find_all('table')),
-            "list_count": len(soup.find_all(['ul', 'ol'])),
-            "has_js": len(soup.find_all('script')) > 0,
-            "has_css": len(soup.find_all(['style', 'link'])) > 0,
-            "common_classes": self._extract_common_classes(soup),
-            "semantic_elements": self._find_semantic_elements(soup)
+            "total_elements": sum(tag_counts.values()),
+            "div_count": tag_counts['div'],
+            "link_count": tag_counts['a'],
+            "image_count": tag_counts['img'],
+            "form_count": tag_counts['form'],
+            "table_count": tag_counts['table'],
+            "list_count": tag_counts['ul'] + tag_counts['ol'],
+            "has_js": tag_counts['script'] > 0,
+            "has_css": tag_counts['style'] + tag_counts['link'] > 0,
+            "common_classes": self._top_classes(class_counts),
+            "semantic_elements": self._semantic_counts(tag_counts)
         }
 
         return features
 
-    def _extract_common_classes(self, soup: BeautifulSoup, top_n: int = 10) -> list:
-        """提取常见的CSS类名"""
-        class_counts = {}
-
-        for element in soup.find_all(class_=True):
-            classes = element.get('class', [])
-            for cls in classes:
-                class_counts[cls] = class_counts.get(cls, 0) + 1
-
-        # 返回出现频率最高的类名
-        sorted_classes = sorted(class_counts.items(),
-                                key=lambda x: x[1], reverse=True)
-        return [cls for cls, count in sorted_classes[:top_n]]
-
-    def _find_semantic_elements(self, soup: BeautifulSoup) -> Dict[str, int]:
-        """查找语义化元素"""
-        semantic_tags = ['header', 'nav', 'main',
-                         'section', 'article', 'aside', 'footer']
-        semantic_counts = {}
-
-        for tag in semantic_tags:
-            count = len(soup.find_all(tag))
-            if count > 0:
-                semantic_counts[tag] = count
-
-        return semantic_counts
+    @staticmethod
+    def _count_tags_and_classes(soup: BeautifulSoup) -> Tuple[Counter, Counter]:
+        """一次遍历统计标签与CSS类名出现次数"""
+        tag_counts = Counter()
+        class_counts = Counter()
+
+        for element in soup.find_all(True):
+            tag_counts[element.name] += 1
+            classes = element.get('class')
+            if classes:
+                class_counts.update(classes)
+
+        return tag_counts, class_counts
+
+    @staticmethod
+    def _top_classes(class_counts: Counter, top_n: int = 10) -> list:
+        """按出现频率取前top_n个类名"""
+        return [cls for cls, count in class_counts.most_common(top_n)]
+
+    @staticmethod
+    def _semantic_counts(tag_counts: Counter) -> Dict[str, int]:
+        """从标签计数中筛选语义化元素"""
+        return {tag: tag_counts[tag] for tag in SEMANTIC_TAGS if tag_counts[tag] > 0}
+
+
+def _parse_and_clean(html_content: str, url: str) -> Tuple[str, str]:
+    """解析HTML并返回（清理后的HTML, 分析上下文），在进程池中执行"""
+    # 只解析一次；上下文提取需在清理之前，框架检测依赖script标签
+    soup = BeautifulSoup(_truncate_raw_html(html_content), HTML_PARSER)
+    analysis_context = PageAnalyzer._prepare_analysis_context(soup, url)
+    return PageAnalyzer._clean_html_for_analysis(soup), analysis_context
@@ -1,6 +1,21 @@
 """AI提示模板"""
 
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
+
+
+def _split_template(template: str, *fields: str) -> Tuple[str, ...]:
+    """按占位符顺序切分模板，返回还原花括号转义后的字面量片段"""
+    marker = "\0"
+    return tuple(template.format(**{name: marker for name in fields}).split(marker))
+
+
+def _render(parts: Tuple[str, ...], *values: str) -> str:
+    """将字面量片段与占位符取值交替拼接"""
+    pieces = [parts[0]]
+    for value, part in zip(values, parts[1:]):
+        pieces.append(value)
+        pieces.append(part)
+    return "".join(pieces)
 
 
 class PromptTemplates:
@@ -159,36 +174,46 @@ class PromptTemplates:
 }}
 """
     
+    # 模板在类定义时按占位符预先切分，生成提示时直接拼接，无需每次由str.format扫描整个模板
+    _PAGE_ANALYSIS_PARTS = _split_template(
+        PAGE_ANALYSIS_TEMPLATE, "html_content", "additional_context")
+    _SELECTOR_GENERATION_PARTS = _split_template(
+        SELECTOR_GENERATION_TEMPLATE, "analysis_data")
+    _VALIDATION_PARTS = _split_template(
+        VALIDATION_TEMPLATE, "selectors", "html_content")
+    _ERROR_RECOVERY_PARTS = _split_template(
+        ERROR_RECOVERY_TEMPLATE, "error_message", "failed_selectors", "html_sample")
+    
     @classmethod
     def get_page_analysis_prompt(cls, html_content: str, additional_context: str = "") -> str:
         """获取页面分析提示"""
-        return cls.PAGE_ANALYSIS_TEMPLATE.format(
-            html_content=html_content[:50000],  # 限制HTML长度
-            additional_context=additional_context
+        return _render(
+            cls._PAGE_ANALYSIS_PARTS,
+            html_content[:50000],  # 限制HTML长度
+            additional_context
         )
     
     @classmethod
     def get_selector_generation_prompt(cls, analysis_data: Dict[str, Any]) -> str:
         """获取选择器生成提示"""
-        return cls.SELECTOR_GENERATION_TEMPLATE.format(
-            analysis_data=str(analysis_data)
-        )
+        return _render(cls._SELECTOR_GENERATION_PARTS, str(analysis_data))
     
     @classmethod
     def get_validation_prompt(cls, selectors: Dict[str, str], html_content: str) -> str:
         """获取验证提示"""
-        return cls.VALIDATION_TEMPLATE.format(
-            selectors=selectors,
-            html_content=html_content[:30000]  # 限制HTML长度
+        return _render(
+            cls._VALIDATION_PARTS,
+            str(selectors),
+            html_content[:30000]  # 限制HTML长度
         )
     
     @classmethod
     def get_error_recovery_prompt(cls, error_message: str, failed_selectors: Dict[str, str], 
                                  html_sample: str) -> str:
         """获取错误恢复提示"""
-        return cls.ERROR_RECOVERY_TEMPLATE.format(
-            error_message=error_message,
-            failed_selectors=failed_selectors,
-            html_sample=html_sample[:20000]  # 限制HTML长度
+        return _render(
+            cls._ERROR_RECOVERY_PARTS,
+            str(error_message),
+            str(failed_selectors),
+            html_sample[:20000]  # 限制HTML长度
         )
-
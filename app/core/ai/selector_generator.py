@@ -2,15 +2,57 @@
 
 import json
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 from bs4 import BeautifulSoup, Tag
 from app.core.ai.prompt_templates import PromptTemplates
-from app.core.ai.page_analyzer import AIAnalysisResponse
+from app.core.ai.page_analyzer import AIAnalysisResponse, HTML_PARSER, compile_selector
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 特异性计算用正则（ID与类名互不重叠，合并为一次扫描）
+_ID_OR_CLASS_RE = re.compile(r'[#.][\w-]+')
+_WORD_RE = re.compile(r'\b[a-zA-Z]+\b')
+
+# 不含职位信息的标签，解析后移除
+NON_CONTENT_TAGS = ['script', 'style', 'noscript', 'template', 'svg']
+
+# 简单选择器：tag、.class 或 tag.class，可直接用 find 查找而无需 soupsieve
+_SIMPLE_SELECTOR_RE = re.compile(r'^([a-z][a-z0-9]*)?(?:\.([\w-]+))?$')
+# 属性包含选择器：tag[attr*="value"]，转为预编译正则交给 find 匹配
+_ATTR_CONTAINS_RE = re.compile(r'^([a-z][a-z0-9]*)?\[([\w-]+)\*="([^"]+)"\]$')
+
+
+@lru_cache(maxsize=1024)
+def _selector_specificity(selector: str) -> int:
+    """计算选择器特异性（同一选择器在各字段、各页面间反复出现，结果按字符串缓存）"""
+    # 简单的特异性计算：ID与类名数量 + 单词数量
+    specificity = len(_WORD_RE.findall(selector))  # 标签
+    if '#' in selector or '.' in selector:
+        specificity += len(_ID_OR_CLASS_RE.findall(selector))  # ID / Class
+    return specificity
+
+
+def _build_fallback_matcher(pattern: str) -> Callable[[BeautifulSoup], bool]:
+    """根据回退选择器的形式生成存在性判断函数，简单选择器与属性包含选择器走 find，其余走 soupsieve"""
+    simple = _SIMPLE_SELECTOR_RE.match(pattern)
+    if simple and pattern:
+        tag_name, class_name = simple.groups()
+        if class_name:
+            return lambda soup: soup.find(tag_name or True, class_=class_name) is not None
+        return lambda soup: soup.find(tag_name) is not None
+    
+    attr_contains = _ATTR_CONTAINS_RE.match(pattern)
+    if attr_contains:
+        tag_name, attr_name, value = attr_contains.groups()
+        attrs = {attr_name: re.compile(re.escape(value))}
+        return lambda soup: soup.find(tag_name or True, attrs=attrs) is not None
+    
+    compiled = compile_selector(pattern)
+    return lambda soup: compiled.select_one(soup) is not None
+
 
 @dataclass
 class SelectorCandidate:
@@ -25,6 +67,59 @@ class SelectorCandidate:
 class SelectorGenerator:
     """选择器生成器"""
     
+    # 各类型的回退选择器（按优先级排列）
+    FALLBACK_PATTERNS = {
+        'jobList': [
+            '.jobs-list', '.job-list', '.positions', '.careers',
+            '.search-results', '.listings', '[class*="job"]',
+            'ul[class*="job"]', 'div[class*="list"]'
+        ],
+        'jobItem': [
+            '.job-item', '.job-card', '.position', '.listing',
+            '.job-posting', '[class*="job-item"]', 'li[class*="job"]',
+            'div[class*="item"]', '.result-item'
+        ],
+        'jobTitle': [
+            '.job-title', '.position-title', '.title', 'h1', 'h2', 'h3',
+            'a[class*="title"]', '[class*="job-title"]', '.name'
+        ],
+        'jobLink': [
+            'a[href*="/job/"]', 'a[href*="/position/"]', 'a[href*="/career/"]',
+            '.job-link', '.title-link', 'a.title', 'h3 a', 'h2 a'
+        ],
+        'companyName': [
+            '.company', '.employer', '.company-name', '.organization',
+            '[class*="company"]', '[class*="employer"]', '.firm'
+        ],
+        'publishedAt': [
+            '.date', '.time', '.published', '.posted', '.created',
+            '[class*="date"]', '[class*="time"]', '.ago'
+        ],
+        'location': [
+            '.location', '.city', '.address', '.place',
+            '[class*="location"]', '[class*="city"]', '.region'
+        ],
+        'jobDescription': [
+            '.description', '.summary', '.content', '.details',
+            '[class*="description"]', '[class*="summary"]', 'p'
+        ],
+        'nextPage': [
+            '.next', '.next-page', '[aria-label*="next"]', '[aria-label*="下一页"]',
+            'a[href*="page="]', '.pagination .next', 'button[class*="next"]'
+        ]
+    }
+    
+    # 元素数量评分规则：(最小数量, 最大数量, 得分)，按顺序取第一个命中的区间
+    COUNT_SCORE_RULES = {
+        'jobList': ((1, 2, 0.3), (0, 5, 0.2)),  # 职位列表应该只有1-2个
+        'jobItem': ((5, 100, 0.3), (1, 200, 0.2)),  # 职位项应该有多个(5-100)
+        'nextPage': ((1, 1, 0.3), (0, 3, 0.2)),  # 下一页按钮应该只有1个
+    }
+    DEFAULT_COUNT_SCORE_RULES = ((1, float('inf'), 0.3),)  # 其他元素应该有合理数量
+    
+    # 回退选择器按类型预编译为判断函数，进程内只解析一次
+    _COMPILED_FALLBACKS: Dict[str, List[Tuple[str, Callable[[BeautifulSoup], bool]]]] = {}
+    
     def __init__(self):
         self.job_related_keywords = [
             'job', 'position', 'career', 'work', 'employment', 'vacancy',
@@ -45,12 +140,30 @@ class SelectorGenerator:
             'time', 'date', 'published', 'posted', 'created',
             'updated', 'ago', 'recent'
         ]
+        
+        # 每组关键词合并为一个正则，单次扫描即可判断是否命中任一关键词
+        job_pattern = self._compile_keywords(self.job_related_keywords)
+        self.keyword_patterns = {
+            'jobList': job_pattern,
+            'jobItem': job_pattern,
+            'jobTitle': job_pattern,
+            'jobDescription': job_pattern,
+            'companyName': self._compile_keywords(self.company_keywords),
+            'location': self._compile_keywords(self.location_keywords),
+            'publishedAt': self._compile_keywords(self.time_keywords),
+        }
+    
+    @staticmethod
+    def _compile_keywords(keywords: List[str]) -> re.Pattern:
+        """将关键词列表编译为多选正则"""
+        return re.compile('|'.join(map(re.escape, keywords)))
     
     async def generate_selectors(self, ai_analysis: AIAnalysisResponse, 
                                html_content: str) -> Dict[str, str]:
         """生成选择器配置"""
+        soup = None
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = self._parse_html(html_content)
             
             # 结合AI分析和启发式方法生成选择器
             selectors = {}
@@ -58,20 +171,23 @@ class SelectorGenerator:
             # 1. 使用AI推荐的选择器作为基础
             ai_selectors = ai_analysis.recommended_selectors
             
+            # 本页面内选择器匹配结果缓存，同一选择器只匹配一次
+            match_cache: Dict[str, Tuple[int, Optional[Tag]]] = {}
+            
             # 2. 启发式验证和优化
             for key in ['jobList', 'jobItem', 'jobTitle', 'jobLink', 'companyName', 
                        'publishedAt', 'location', 'jobDescription', 'nextPage']:
                 
                 ai_selector = ai_selectors.get(key, '')
                 optimized_selector = await self._optimize_selector(
-                    key, ai_selector, soup, ai_analysis.detected_elements
+                    key, ai_selector, soup, ai_analysis.detected_elements, match_cache
                 )
                 
                 if optimized_selector:
                     selectors[key] = optimized_selector
                 else:
                     # 如果AI选择器无效，使用启发式方法
-                    fallback_selector = self._generate_fallback_selector(key, soup)
+                    fallback_selector = self._generate_fallback_selector(key, soup, match_cache)
                     if fallback_selector:
                         selectors[key] = fallback_selector
             
@@ -79,73 +195,81 @@ class SelectorGenerator:
             
         except Exception as e:
             logger.error(f"选择器生成失败: {e}")
-            # 返回基于启发式的默认选择器
-            return self._generate_heuristic_selectors(html_content)
+            # 返回基于启发式的默认选择器（复用已解析的文档）
+            return self._generate_heuristic_selectors(html_content, soup)
     
     async def _optimize_selector(self, selector_type: str, ai_selector: str, 
-                               soup: BeautifulSoup, detected_elements: Dict[str, Any]) -> Optional[str]:
+                               soup: BeautifulSoup, detected_elements: Dict[str, Any],
+                               match_cache: Optional[Dict[str, Tuple[int, Optional[Tag]]]] = None) -> Optional[str]:
         """优化单个选择器"""
         if not ai_selector:
             return None
         
         try:
             # 验证AI选择器
-            elements = soup.select(ai_selector)
+            element_count, first_element = self._count_matches(ai_selector, soup, match_cache)
             
-            if elements:
+            if element_count:
                 # 检查选择器的质量
                 quality_score = self._evaluate_selector_quality(
-                    selector_type, ai_selector, elements, soup
+                    selector_type, ai_selector, element_count, soup
                 )
                 
                 if quality_score >= 0.7:  # 质量阈值
                     return ai_selector
                 else:
                     # 尝试优化选择器
-                    optimized = self._improve_selector(ai_selector, elements, soup)
+                    optimized = self._improve_selector(
+                        ai_selector, element_count, first_element, soup, match_cache
+                    )
                     return optimized if optimized else ai_selector
             else:
                 # AI选择器无效，尝试从检测到的元素中选择
                 candidates = detected_elements.get(f"{selector_type}_elements", [])
-                return self._select_best_candidate(candidates, soup)
+                return self._select_best_candidate(candidates, soup, match_cache)
                 
         except Exception as e:
             logger.warning(f"选择器优化失败 {selector_type}: {e}")
             return ai_selector
     
+    @staticmethod
+    def _count_matches(selector: str, soup: BeautifulSoup,
+                       match_cache: Optional[Dict[str, Tuple[int, Optional[Tag]]]] = None
+                       ) -> Tuple[int, Optional[Tag]]:
+        """统计匹配数量并返回第一个匹配元素，不构建完整结果列表
+
+        传入缓存时同一选择器只匹配一次。
+        """
+        if match_cache is not None and selector in match_cache:
+            return match_cache[selector]
+        
+        count = 0
+        first_element = None
+        for element in compile_selector(selector).iselect(soup):
+            if first_element is None:
+                first_element = element
+            count += 1
+        
+        result = (count, first_element)
+        if match_cache is not None:
+            match_cache[selector] = result
+        return result
+    
     def _evaluate_selector_quality(self, selector_type: str, selector: str, 
-                                 elements: List[Tag], soup: BeautifulSoup) -> float:
+                                 element_count: int, soup: BeautifulSoup) -> float:
         """评估选择器质量"""
         score = 0.0
         
         # 基础存在性 (40%)
-        if elements:
+        if element_count:
             score += 0.4
         
-        # 元素数量合理性 (30%)
-        element_count = len(elements)
-        if selector_type == 'jobList':
-            # 职位列表应该只有1-2个
-            if 1 <= element_count <= 2:
-                score += 0.3
-            elif element_count <= 5:
-                score += 0.2
-        elif selector_type in ['jobItem']:
-            # 职位项应该有多个(5-100)
-            if 5 <= element_count <= 100:
-                score += 0.3
-            elif 1 <= element_count <= 200:
-                score += 0.2
-        elif selector_type == 'nextPage':
-            # 下一页按钮应该只有1个
-            if element_count == 1:
-                score += 0.3
-            elif element_count <= 3:
-                score += 0.2
-        else:
-            # 其他元素应该有合理数量
-            if element_count > 0:
-                score += 0.3
+        # 元素数量合理性 (30%)：取第一个命中的数量区间得分
+        count_rules = self.COUNT_SCORE_RULES.get(selector_type, self.DEFAULT_COUNT_SCORE_RULES)
+        score += next(
+            (rule_score for low, high, rule_score in count_rules if low <= element_count <= high),
+            0.0
+        )
         
         # 选择器特异性 (20%)
         specificity = self._calculate_specificity(selector)
@@ -162,30 +286,19 @@ class SelectorGenerator:
     
     def _calculate_specificity(self, selector: str) -> int:
         """计算选择器特异性"""
-        # 简单的特异性计算
-        specificity = 0
-        specificity += len(re.findall(r'#[\w-]+', selector))  # ID
-        specificity += len(re.findall(r'\.[\w-]+', selector))  # Class
-        specificity += len(re.findall(r'\b[a-zA-Z]+\b', selector))  # 标签
-        return specificity
+        return _selector_specificity(selector)
     
     def _is_semantically_relevant(self, selector: str, selector_type: str) -> bool:
         """检查选择器语义相关性"""
-        selector_lower = selector.lower()
-        
-        if selector_type in ['jobList', 'jobItem', 'jobTitle', 'jobDescription']:
-            return any(keyword in selector_lower for keyword in self.job_related_keywords)
-        elif selector_type == 'companyName':
-            return any(keyword in selector_lower for keyword in self.company_keywords)
-        elif selector_type == 'location':
-            return any(keyword in selector_lower for keyword in self.location_keywords)
-        elif selector_type == 'publishedAt':
-            return any(keyword in selector_lower for keyword in self.time_keywords)
+        pattern = self.keyword_patterns.get(selector_type)
+        if pattern is None:
+            return False
         
-        return False
+        return pattern.search(selector.lower()) is not None
     
-    def _improve_selector(self, original_selector: str, elements: List[Tag], 
-                         soup: BeautifulSoup) -> Optional[str]:
+    def _improve_selector(self, original_selector: str, element_count: int,
+                         first_element: Optional[Tag], soup: BeautifulSoup,
+                         match_cache: Optional[Dict[str, Tuple[int, Optional[Tag]]]] = None) -> Optional[str]:
         """改进选择器"""
         # 尝试简化过于复杂的选择器
         if len(original_selector.split()) > 4:
@@ -193,26 +306,26 @@ class SelectorGenerator:
             parts = original_selector.split()
             simplified = parts[-1]
             
-            test_elements = soup.select(simplified)
-            if test_elements and len(test_elements) <= len(elements) * 2:
+            test_count, _ = self._count_matches(simplified, soup, match_cache)
+            if test_count and test_count <= element_count * 2:
                 return simplified
         
         # 尝试添加更多限定条件
-        if len(elements) > 50:  # 如果匹配太多元素
-            first_element = elements[0]
+        if element_count > 50:  # 如果匹配太多元素
             parent = first_element.parent
             
             if parent and parent.get('class'):
                 parent_class = '.'.join(parent.get('class'))
                 improved = f".{parent_class} {original_selector}"
                 
-                test_elements = soup.select(improved)
-                if test_elements and len(test_elements) < len(elements):
+                test_count, _ = self._count_matches(improved, soup, match_cache)
+                if test_count and test_count < element_count:
                     return improved
         
         return None
     
-    def _select_best_candidate(self, candidates: List[str], soup: BeautifulSoup) -> Optional[str]:
+    def _select_best_candidate(self, candidates: List[str], soup: BeautifulSoup,
+                               match_cache: Optional[Dict[str, Tuple[int, Optional[Tag]]]] = None) -> Optional[str]:
         """从候选选择器中选择最佳的"""
         if not candidates:
             return None
@@ -222,87 +335,79 @@ class SelectorGenerator:
         
         for candidate in candidates:
             try:
-                elements = soup.select(candidate)
-                if elements:
+                if match_cache and candidate in match_cache:
+                    element_count = match_cache[candidate][0]
+                else:
+                    # 评分只区分1-50个与更多，匹配数超过51无需继续查找
+                    element_count = sum(
+                        1 for _ in compile_selector(candidate).iselect(soup, limit=51)
+                    )
+                if element_count:
                     # 简单评分：元素数量适中，特异性合理
-                    element_count = len(elements)
-                    specificity = self._calculate_specificity(candidate)
-                    
-                    score = 0.0
+                    score = 0.2  # 存在匹配
                     if 1 <= element_count <= 50:
                         score += 0.5
+                    
+                    # 即使特异性得分也无法超过当前最佳时，跳过特异性计算
+                    if score + 0.3 <= best_score:
+                        continue
+                    
+                    specificity = self._calculate_specificity(candidate)
                     if 1 <= specificity <= 4:
                         score += 0.3
-                    if element_count > 0:
-                        score += 0.2
                     
                     if score > best_score:
                         best_score = score
                         best_candidate = candidate
                         
+                        # 已达到满分，后续候选不可能更优
+                        if best_score >= 1.0:
+                            break
+                        
             except Exception:
                 continue
         
         return best_candidate
     
-    def _generate_fallback_selector(self, selector_type: str, soup: BeautifulSoup) -> Optional[str]:
+    def _generate_fallback_selector(self, selector_type: str, soup: BeautifulSoup,
+                                    match_cache: Optional[Dict[str, Tuple[int, Optional[Tag]]]] = None) -> Optional[str]:
         """生成回退选择器"""
-        fallback_patterns = {
-            'jobList': [
-                '.jobs-list', '.job-list', '.positions', '.careers',
-                '.search-results', '.listings', '[class*="job"]',
-                'ul[class*="job"]', 'div[class*="list"]'
-            ],
-            'jobItem': [
-                '.job-item', '.job-card', '.position', '.listing',
-                '.job-posting', '[class*="job-item"]', 'li[class*="job"]',
-                'div[class*="item"]', '.result-item'
-            ],
-            'jobTitle': [
-                '.job-title', '.position-title', '.title', 'h1', 'h2', 'h3',
-                'a[class*="title"]', '[class*="job-title"]', '.name'
-            ],
-            'jobLink': [
-                'a[href*="/job/"]', 'a[href*="/position/"]', 'a[href*="/career/"]',
-                '.job-link', '.title-link', 'a.title', 'h3 a', 'h2 a'
-            ],
-            'companyName': [
-                '.company', '.employer', '.company-name', '.organization',
-                '[class*="company"]', '[class*="employer"]', '.firm'
-            ],
-            'publishedAt': [
-                '.date', '.time', '.published', '.posted', '.created',
-                '[class*="date"]', '[class*="time"]', '.ago'
-            ],
-            'location': [
-                '.location', '.city', '.address', '.place',
-                '[class*="location"]', '[class*="city"]', '.region'
-            ],
-            'jobDescription': [
-                '.description', '.summary', '.content', '.details',
-                '[class*="description"]', '[class*="summary"]', 'p'
-            ],
-            'nextPage': [
-                '.next', '.next-page', '[aria-label*="next"]', '[aria-label*="下一页"]',
-                'a[href*="page="]', '.pagination .next', 'button[class*="next"]'
-            ]
-        }
-        
-        patterns = fallback_patterns.get(selector_type, [])
-        
-        for pattern in patterns:
-            try:
-                elements = soup.select(pattern)
-                if elements:
+        for pattern, has_match in self._compiled_fallbacks(selector_type):
+            if match_cache and pattern in match_cache:
+                if match_cache[pattern][0]:
                     return pattern
-            except Exception:
                 continue
+            # 只需判断是否存在匹配，找到第一个即停止
+            if has_match(soup):
+                return pattern
         
         return None
     
-    def _generate_heuristic_selectors(self, html_content: str) -> Dict[str, str]:
+    @classmethod
+    def _compiled_fallbacks(cls, selector_type: str) -> List[Tuple[str, Callable[[BeautifulSoup], bool]]]:
+        """获取某类型的预编译回退选择器"""
+        compiled = cls._COMPILED_FALLBACKS.get(selector_type)
+        if compiled is None:
+            compiled = [
+                (pattern, _build_fallback_matcher(pattern))
+                for pattern in cls.FALLBACK_PATTERNS.get(selector_type, [])
+            ]
+            cls._COMPILED_FALLBACKS[selector_type] = compiled
+        return compiled
+    
+    @staticmethod
+    def _parse_html(html_content: str) -> BeautifulSoup:
+        """解析HTML并移除不含职位内容的标签，缩小后续选择器匹配的范围"""
+        soup = BeautifulSoup(html_content, HTML_PARSER)
+        for tag in soup(NON_CONTENT_TAGS):
+            tag.decompose()
+        return soup
+    
+    def _generate_heuristic_selectors(self, html_content: str,
+                                      soup: Optional[BeautifulSoup] = None) -> Dict[str, str]:
         """基于启发式方法生成选择器"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if soup is None:
+            soup = self._parse_html(html_content)
         selectors = {}
         
         # 为每个类型生成选择器
@@ -316,32 +421,33 @@ class SelectorGenerator:
         
         return selectors
     
-    def generate_selector_variations(self, base_selector: str) -> List[str]:
-        """生成选择器变体"""
-        variations = [base_selector]
-        
-        # 添加更宽泛的变体
-        if '.' in base_selector:
-            # 移除最后一个类
-            parts = base_selector.split('.')
-            if len(parts) > 2:
-                variations.append('.'.join(parts[:-1]))
+    def generate_selector_variations(self, base_selector: str) -> Iterator[str]:
+        """按顺序惰性生成选择器变体（去重），调用方找到可用变体后即可停止迭代"""
+        seen = set()
         
-        # 添加属性选择器变体
-        if '[' not in base_selector:
-            # 尝试添加常见属性
-            variations.extend([
-                f"{base_selector}[href]",
-                f"{base_selector}[title]",
-                f"{base_selector}[data-*]"
-            ])
-        
-        # 添加伪类变体
-        variations.extend([
-            f"{base_selector}:not(.hidden)",
-            f"{base_selector}:visible",
-            f"{base_selector}:first-child"
-        ])
+        def candidates() -> Iterator[str]:
+            yield base_selector
+            
+            # 添加更宽泛的变体
+            if '.' in base_selector:
+                # 移除最后一个类
+                parts = base_selector.split('.')
+                if len(parts) > 2:
+                    yield '.'.join(parts[:-1])
+            
+            # 添加属性选择器变体
+            if '[' not in base_selector:
+                # 尝试添加常见属性
+                yield f"{base_selector}[href]"
+                yield f"{base_selector}[title]"
+                yield f"{base_selector}[data-*]"
+            
+            # 添加伪类变体
+            yield f"{base_selector}:not(.hidden)"
+            yield f"{base_selector}:visible"
+            yield f"{base_selector}:first-child"
         
-        return variations
-
+        for variation in candidates():
+            if variation not in seen:
+                seen.add(variation)
+                yield variation
@@ -2,18 +2,97 @@
 
 import random
 import asyncio
+import textwrap
 from typing import List, Dict, Any
-from playwright.async_api import Page
+from playwright.async_api import BrowserContext, Page
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 移除webdriver等自动化特征的初始化脚本（模块加载时构建一次，每个页面复用）
+STEALTH_INIT_SCRIPT = textwrap.dedent("""
+    // 覆盖navigator上的自动化特征属性
+    const navigatorOverrides = {
+        webdriver: undefined,
+        plugins: [1, 2, 3, 4, 5],
+        languages: ['zh-CN', 'zh', 'en'],
+        platform: 'Win32',
+    };
+    for (const [name, value] of Object.entries(navigatorOverrides)) {
+        Object.defineProperty(navigator, name, { get: () => value });
+    }
+
+    // 修改chrome对象
+    window.chrome = { runtime: {} };
+
+    // 修改权限查询
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+""").strip()
+
+
+# 常见的反爬虫指标（类型, 关键词），按检测优先级排列
+BOT_INDICATOR_KEYWORDS = tuple(
+    (detection_type, keyword)
+    for detection_type, keywords in (
+        ("captcha", ("captcha", "recaptcha", "hcaptcha")),
+        ("cloudflare", ("cloudflare", "checking your browser", "ddos protection")),
+        ("rate_limit", ("too many requests", "rate limit", "slow down")),
+        ("access_denied", ("access denied", "forbidden", "blocked")),
+        ("human_verification", ("human verification", "verify you are human")),
+    )
+    for keyword in keywords
+)
+# 预先转为小写的关键词列表（与上表下标一一对应），每次检测直接传入页面
+BOT_KEYWORDS_LOWER = [keyword.lower() for _, keyword in BOT_INDICATOR_KEYWORDS]
+
+# 页面内执行的关键词查找（与page.content()同样基于完整HTML），返回命中关键词的下标
+BOT_KEYWORD_SEARCH_SCRIPT = textwrap.dedent("""
+    (keywords) => {
+        const html = document.documentElement.outerHTML.toLowerCase();
+        const hits = [];
+        keywords.forEach((keyword, index) => {
+            if (html.includes(keyword)) {
+                hits.push(index);
+            }
+        });
+        return hits;
+    }
+""").strip()
+
+# 页面内执行的随机滚动流程：页面太短时直接返回，否则逐步平滑滚动后回到顶部
+RANDOM_SCROLL_SCRIPT = textwrap.dedent("""
+    async (steps) => {
+        const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+        const pageHeight = document.body.scrollHeight;
+        if (pageHeight <= window.innerHeight) {
+            return;
+        }
+        for (const [ratio, delay] of steps) {
+            window.scrollBy({ top: Math.floor(pageHeight * ratio), behavior: 'smooth' });
+            await sleep(delay);
+        }
+        window.scrollTo({ top: 0, behavior: 'smooth' });
+        await sleep(1000);
+    }
+""").strip()
+
 
 class AntiDetectionManager:
     """反检测管理器"""
     
     def __init__(self):
+        # 实例级随机数生成器，缓存常用绑定方法，减少模拟行为循环中的属性查找
+        self._rng = random.Random()
+        self._choice = self._rng.choice
+        self._uniform = self._rng.uniform
+        self._randint = self._rng.randint
+        
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -36,78 +115,43 @@ class AntiDetectionManager:
             {"scroll_delay": (1.5, 2.5), "click_delay": (0.8, 1.8), "type_delay": (0.15, 0.35)}
         ]
         
-        self.current_behavior = random.choice(self.behavior_patterns)
+        self.current_behavior = self._choice(self.behavior_patterns)
     
-    async def apply_stealth_measures(self, page: Page) -> None:
-        """应用隐身措施"""
-        try:
-            # 1. 设置随机User-Agent
-            if settings.user_agent_rotation:
-                user_agent = random.choice(self.user_agents)
-                await page.set_extra_http_headers({
-                    'User-Agent': user_agent,
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1'
-                })
-            
+    def get_context_options(self) -> Dict[str, Any]:
+        """生成浏览器上下文的隐身参数（创建上下文时一次性设置，上下文内所有页面共享）"""
+        options = {
+            # 1. 设置通用请求头
+            "extra_http_headers": {
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1'
+            },
             # 2. 设置随机视口大小
-            viewport = random.choice(self.viewport_sizes)
-            await page.set_viewport_size(viewport)
-            
-            # 3. 移除webdriver标识
-            await page.add_init_script("""
-                // 移除webdriver属性
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined,
-                });
-                
-                // 修改plugins
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5],
-                });
-                
-                // 修改languages
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['zh-CN', 'zh', 'en'],
-                });
-                
-                // 修改platform
-                Object.defineProperty(navigator, 'platform', {
-                    get: () => 'Win32',
-                });
-                
-                // 修改chrome对象
-                window.chrome = {
-                    runtime: {},
-                };
-                
-                // 修改权限查询
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Cypress.denied }) :
-                        originalQuery(parameters)
-                );
-            """)
-            
-            # 4. 设置随机时区
-            timezones = ['Asia/Shanghai', 'Asia/Beijing', 'Asia/Hong_Kong']
-            timezone = random.choice(timezones)
-            await page.emulate_timezone(timezone)
-            
-            # 5. 设置随机地理位置
-            locations = [
+            "viewport": self._choice(self.viewport_sizes),
+            # 3. 设置随机时区
+            "timezone_id": self._choice(['Asia/Shanghai', 'Asia/Chongqing', 'Asia/Hong_Kong']),
+            # 4. 设置随机地理位置
+            "geolocation": self._choice([
                 {"latitude": 39.9042, "longitude": 116.4074},  # 北京
                 {"latitude": 31.2304, "longitude": 121.4737},  # 上海
                 {"latitude": 22.3193, "longitude": 114.1694},  # 香港
-            ]
-            location = random.choice(locations)
-            await page.set_geolocation(location)
-            
+            ]),
+        }
+        
+        # 5. 设置随机User-Agent
+        if settings.user_agent_rotation:
+            options["user_agent"] = self._choice(self.user_agents)
+        
+        return options
+    
+    async def apply_stealth_measures(self, context: BrowserContext) -> None:
+        """应用隐身措施：在上下文上注册一次初始化脚本，之后创建的页面自动生效"""
+        try:
+            # 移除webdriver标识
+            await context.add_init_script(STEALTH_INIT_SCRIPT)
             logger.debug("反检测措施应用完成")
             
         except Exception as e:
@@ -126,7 +170,7 @@ class AntiDetectionManager:
             await self._random_mouse_movement(page)
             
             # 3. 随机停顿
-            delay = random.uniform(*self.current_behavior["scroll_delay"])
+            delay = self._uniform(*self.current_behavior["scroll_delay"])
             await asyncio.sleep(delay)
             
             logger.debug("人类行为模拟完成")
@@ -137,38 +181,14 @@ class AntiDetectionManager:
     async def _random_scroll(self, page: Page) -> None:
         """随机滚动页面"""
         try:
-            # 获取页面高度
-            page_height = await page.evaluate("document.body.scrollHeight")
-            viewport_height = await page.evaluate("window.innerHeight")
-            
-            if page_height <= viewport_height:
-                return  # 页面太短，不需要滚动
-            
-            # 随机滚动次数
-            scroll_count = random.randint(2, 5)
-            
-            for _ in range(scroll_count):
-                # 随机滚动距离（页面高度的10%-30%）
-                scroll_distance = random.randint(
-                    int(page_height * 0.1),
-                    int(page_height * 0.3)
-                )
-                
-                # 平滑滚动
-                await page.evaluate(f"""
-                    window.scrollBy({{
-                        top: {scroll_distance},
-                        behavior: 'smooth'
-                    }});
-                """)
-                
-                # 滚动间隔
-                delay = random.uniform(0.5, 2.0)
-                await asyncio.sleep(delay)
+            # 随机滚动次数，每步为（滚动距离占页面高度的比例10%-30%, 滚动间隔毫秒）
+            steps = [
+                (self._uniform(0.1, 0.3), int(self._uniform(0.5, 2.0) * 1000))
+                for _ in range(self._randint(2, 5))
+            ]
             
-            # 滚动回顶部
-            await page.evaluate("window.scrollTo({top: 0, behavior: 'smooth'})")
-            await asyncio.sleep(1)
+            # 整个滚动过程在页面内一次执行完成，避免每步一次往返
+            await page.evaluate(RANDOM_SCROLL_SCRIPT, steps)
             
         except Exception as e:
             logger.warning(f"随机滚动失败: {e}")
@@ -182,18 +202,18 @@ class AntiDetectionManager:
                 return
             
             # 随机移动次数
-            move_count = random.randint(2, 4)
+            move_count = self._randint(2, 4)
             
             for _ in range(move_count):
                 # 随机坐标
-                x = random.randint(100, viewport["width"] - 100)
-                y = random.randint(100, viewport["height"] - 100)
+                x = self._randint(100, viewport["width"] - 100)
+                y = self._randint(100, viewport["height"] - 100)
                 
                 # 移动鼠标
                 await page.mouse.move(x, y)
                 
                 # 随机停顿
-                delay = random.uniform(0.3, 0.8)
+                delay = self._uniform(0.3, 0.8)
                 await asyncio.sleep(delay)
         
         except Exception as e:
@@ -209,14 +229,14 @@ class AntiDetectionManager:
             await page.hover(selector)
             
             # 随机延迟
-            delay = random.uniform(*self.current_behavior["click_delay"])
+            delay = self._uniform(*self.current_behavior["click_delay"])
             await asyncio.sleep(delay)
             
             # 点击
             await page.click(selector)
             
             # 点击后延迟
-            await asyncio.sleep(random.uniform(0.5, 1.0))
+            await asyncio.sleep(self._uniform(0.5, 1.0))
             
             return True
             
@@ -233,11 +253,14 @@ class AntiDetectionManager:
             # 清空现有内容
             await page.fill(selector, "")
             
-            # 模拟逐字符输入
-            for char in text:
-                await page.type(selector, char)
-                delay = random.uniform(*self.current_behavior["type_delay"])
-                await asyncio.sleep(delay)
+            # 模拟逐字符输入：每4-8个字符一次调用，按键间隔由Playwright在页面侧完成，
+            # 每段使用不同的随机间隔保留节奏变化
+            position = 0
+            while position < len(text):
+                chunk_size = self._randint(4, 8)
+                delay_ms = self._uniform(*self.current_behavior["type_delay"]) * 1000
+                await page.type(selector, text[position:position + chunk_size], delay=delay_ms)
+                position += chunk_size
             
             return True
             
@@ -311,7 +334,7 @@ class AntiDetectionManager:
     
     def update_behavior_pattern(self) -> None:
         """更新行为模式"""
-        self.current_behavior = random.choice(self.behavior_patterns)
+        self.current_behavior = self._choice(self.behavior_patterns)
         logger.debug("行为模式已更新")
     
     async def detect_bot_detection(self, page: Page) -> Dict[str, Any]:
@@ -324,27 +347,14 @@ class AntiDetectionManager:
         }
         
         try:
-            page_content = await page.content()
-            page_text = page_content.lower()
+            # 在页面内完成关键词查找，只回传命中的下标，避免整页HTML经CDP传输
+            hit_indexes = await page.evaluate(BOT_KEYWORD_SEARCH_SCRIPT, BOT_KEYWORDS_LOWER)
             
             # 检测常见的反爬虫指标
-            bot_indicators = {
-                "captcha": ["captcha", "recaptcha", "hcaptcha"],
-                "cloudflare": ["cloudflare", "checking your browser", "ddos protection"],
-                "rate_limit": ["too many requests", "rate limit", "slow down"],
-                "access_denied": ["access denied", "forbidden", "blocked"],
-                "human_verification": ["human verification", "verify you are human"]
-            }
-            
-            detected_indicators = []
-            
-            for detection_type, keywords in bot_indicators.items():
-                for keyword in keywords:
-                    if keyword in page_text:
-                        detected_indicators.append({
-                            "type": detection_type,
-                            "keyword": keyword
-                        })
+            detected_indicators = [
+                {"type": BOT_INDICATOR_KEYWORDS[index][0], "keyword": BOT_INDICATOR_KEYWORDS[index][1]}
+                for index in hit_indexes
+            ]
             
             if detected_indicators:
                 detection_result.update({
@@ -1,28 +1,58 @@
 """Browser控制器"""
 
 import asyncio
-import random
+import re
+import textwrap
 import time
 from typing import Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
+from bs4 import BeautifulSoup
 from browser_use import Agent, Browser, BrowserConfig
-from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import BrowserContext, Page, Route, TimeoutError as PlaywrightTimeoutError
 
 from app.config import settings, BrowserConfig as AppBrowserConfig
+from app.core.ai.page_analyzer import HTML_PARSER, compile_selector
 from app.core.browser.anti_detection import AntiDetectionManager
-from app.core.browser.crawler_agent import CrawlerAgent
+from app.core.browser.crawler_agent import CrawlerAgent, JobRecord, SAMPLE_TEXT_LENGTH
+from app.utils.pagination import infer_page_url_template, normalize_page_url
+from app.utils.rate_limiter import AsyncRateLimiter
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 职位提取用不到的资源类型，加载时直接拦截
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+# 常见的反爬虫挑战页面特征，合并为一个忽略大小写的正则，一次扫描完成检测
+CHALLENGE_INDICATOR_RE = re.compile(
+    "|".join(re.escape(indicator) for indicator in (
+        "captcha", "robot", "verify", "protection",
+        "cloudflare", "please wait", "checking browser"
+    )),
+    re.IGNORECASE
+)
+
+# 常见的加载指示器，合并为一个选择器在页面内一次性检查
+LOADING_INDICATOR_SELECTOR = ", ".join([
+    ".loading", ".spinner", ".loader", "[data-loading]",
+    ".loading-indicator", ".progress", ".skeleton"
+])
+
+# 所有加载指示器都不存在或不可见时返回true
+LOADING_INDICATORS_HIDDEN_SCRIPT = textwrap.dedent("""
+    (selector) => Array.from(document.querySelectorAll(selector)).every(
+        (element) => !(element.offsetWidth || element.offsetHeight || element.getClientRects().length)
+    )
+""").strip()
+
 
 @dataclass
 class CrawlResult:
     """爬取结果"""
     success: bool
-    jobs: List[Dict[str, Any]]
+    jobs: List[JobRecord]
     pages_crawled: int
     total_pages: Optional[int]
     errors: List[str]
@@ -49,8 +79,14 @@ class BrowserController:
         self.browser_config = AppBrowserConfig()
         self.anti_detection = AntiDetectionManager()
         self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
         self.current_page: Optional[Page] = None
         self.session_id: Optional[str] = None
+        # 令牌桶限流（每个控制器即每个爬虫会话一个桶）：首个请求立即发出，
+        # 之后按每周期请求数匀速放行
+        self.rate_limiter = AsyncRateLimiter(
+            settings.requests_per_period, settings.rate_period_seconds
+        )
         
     async def initialize(self, session_id: str) -> bool:
         """初始化浏览器"""
@@ -68,6 +104,17 @@ class BrowserController:
             # 创建浏览器实例
             self.browser = Browser(config=config)
             
+            # 在底层Playwright浏览器上创建共享上下文，隐身措施只需应用一次，页面间复用连接、Cookie与缓存
+            playwright_browser = await self.browser.get_playwright_browser()
+            self.context = await playwright_browser.new_context(
+                **self.anti_detection.get_context_options()
+            )
+            await self.anti_detection.apply_stealth_measures(self.context)
+            
+            # 拦截图片、媒体与字体请求，减少页面加载时间与带宽
+            if settings.block_heavy_resources:
+                await self.context.route("**/*", self._block_heavy_resources)
+            
             logger.info(f"浏览器初始化成功 - Session: {session_id}")
             return True
             
@@ -75,32 +122,31 @@ class BrowserController:
             logger.error(f"浏览器初始化失败: {e}")
             return False
     
+    @staticmethod
+    async def _block_heavy_resources(route: Route) -> None:
+        """中止非必要资源的请求，其余请求照常发出"""
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+    
     async def load_page(self, url: str, wait_for_load: bool = True, 
-                       take_screenshot: bool = False) -> PageLoadResult:
-        """加载页面"""
+                       take_screenshot: bool = False,
+                       ready_selector: Optional[str] = None) -> PageLoadResult:
+        """加载页面，提供ready_selector时以其出现作为加载完成信号"""
         start_time = time.time()
         
         try:
-            if not self.browser:
+            if not self.context:
                 raise Exception("浏览器未初始化")
             
-            # 创建新页面
-            page = await self.browser.new_page()
+            # 在共享上下文中创建新页面
+            page = await self.context.new_page()
             self.current_page = page
             
-            # 应用反检测措施
-            await self.anti_detection.apply_stealth_measures(page)
-            
             # 导航到URL
             logger.info(f"正在加载页面: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            
-            # 等待页面加载完成
-            if wait_for_load:
-                await self._wait_for_page_load(page)
-            
-            # 模拟人类行为
-            await self.anti_detection.simulate_human_behavior(page)
+            await self._navigate(page, url, wait_for_load, ready_selector)
             
             # 获取页面内容
             html_content = await page.content()
@@ -136,25 +182,66 @@ class BrowserController:
                 error_message=error_msg
             )
     
+    async def _navigate(self, page: Page, url: str, wait_for_load: bool = True,
+                        ready_selector: Optional[str] = None) -> None:
+        """导航到URL并等待加载、模拟人类行为"""
+        if wait_for_load and ready_selector:
+            # 等待实际数据出现，而不是等待网络空闲
+            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            await self._wait_for_page_load(page, ready_selector)
+        elif wait_for_load:
+            # 没有就绪选择器时以load事件为准，不再额外等待
+            await page.goto(url, wait_until="load", timeout=30000)
+        else:
+            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        
+        # 模拟人类行为
+        await self.anti_detection.simulate_human_behavior(page)
+    
+    async def _crawl_one(self, url: str, selectors: Dict[str, str],
+                         crawler_agent: CrawlerAgent, include_raw_html: bool = False) -> Dict[str, Any]:
+        """在独立页面中爬取单个分页（并发爬取时使用，不修改current_page）"""
+        # 按请求速率限流
+        await self.rate_limiter.acquire()
+        
+        page = await self.context.new_page()
+        try:
+            await self._navigate(page, url, ready_selector=selectors.get("jobItem"))
+            return await crawler_agent.extract_jobs(page, selectors, include_raw_html)
+        finally:
+            await page.close()
+    
     async def crawl_jobs(self, url: str, selectors: Dict[str, str], 
-                        max_pages: int = 10) -> CrawlResult:
+                        max_pages: int = 10, include_raw_html: bool = False) -> CrawlResult:
         """爬取职位信息"""
         start_time = time.time()
         all_jobs = []
         pages_crawled = 0
         errors = []
         current_url = url
+        page_url_template = None
+        seen_urls = set()  # 已爬取页面的标准化URL，防止分页循环
         
         try:
             # 创建爬虫代理
             crawler_agent = CrawlerAgent(self.browser)
             
             while pages_crawled < max_pages and current_url:
+                normalized_url = normalize_page_url(current_url)
+                if normalized_url in seen_urls:
+                    logger.info(f"下一页URL已爬取过，停止爬取: {current_url}")
+                    current_url = None
+                    break
+                seen_urls.add(normalized_url)
+                
                 try:
                     logger.info(f"开始爬取第 {pages_crawled + 1} 页: {current_url}")
                     
-                    # 导航到当前页面
-                    page_result = await self.load_page(current_url, wait_for_load=True)
+                    # 按请求速率限流后导航到当前页面
+                    await self.rate_limiter.acquire()
+                    page_result = await self.load_page(
+                        current_url, wait_for_load=True, ready_selector=selectors.get("jobItem")
+                    )
                     
                     if not page_result.success:
                         errors.append(f"页面 {pages_crawled + 1} 加载失败: {page_result.error_message}")
@@ -162,7 +249,7 @@ class BrowserController:
                     
                     # 提取职位数据
                     extraction_result = await crawler_agent.extract_jobs(
-                        self.current_page, selectors
+                        self.current_page, selectors, include_raw_html
                     )
                     
                     if extraction_result["success"]:
@@ -179,12 +266,12 @@ class BrowserController:
                         
                         if next_page_result["has_next"]:
                             current_url = next_page_result["next_url"]
-                            # 随机延迟
-                            delay = random.uniform(
-                                settings.request_delay_min, 
-                                settings.request_delay_max
-                            )
-                            await asyncio.sleep(delay)
+                            
+                            # 分页URL可由页码推断时，剩余页面改为并发爬取
+                            if pages_crawled == 1 and max_pages > 1:
+                                page_url_template = infer_page_url_template(url, current_url)
+                                if page_url_template:
+                                    break
                         else:
                             logger.info("没有更多页面，爬取完成")
                             break
@@ -200,6 +287,52 @@ class BrowserController:
                     logger.error(error_msg)
                     break
             
+            if page_url_template:
+                batch_size = max(1, settings.max_concurrent_pages)
+                logger.info(f"按页码并发爬取第 2-{max_pages} 页，并发数: {batch_size}")
+                
+                # 按并发数分批爬取，某一批出现空页、重复页或错误时不再发出后续请求
+                previous_jobs = None
+                finished = False
+                for batch_start in range(2, max_pages + 1, batch_size):
+                    page_numbers = range(batch_start, min(batch_start + batch_size, max_pages + 1))
+                    results = await asyncio.gather(
+                        *[
+                            self._crawl_one(
+                                page_url_template(page_number), selectors, crawler_agent,
+                                include_raw_html
+                            )
+                            for page_number in page_numbers
+                        ],
+                        return_exceptions=True
+                    )
+                    
+                    # 按页码顺序合并，遇到空页或重复页视为分页结束
+                    for page_number, result in zip(page_numbers, results):
+                        if isinstance(result, Exception):
+                            error_msg = f"第 {page_number} 页处理异常: {str(result)}"
+                            errors.append(error_msg)
+                            logger.error(error_msg)
+                            finished = True
+                            break
+                        
+                        jobs = result["jobs"]
+                        if not result["success"] or not jobs or jobs == previous_jobs:
+                            logger.info("没有更多页面，爬取完成")
+                            finished = True
+                            break
+                        
+                        all_jobs.extend(jobs)
+                        pages_crawled += 1
+                        previous_jobs = jobs
+                        logger.info(f"第 {pages_crawled} 页提取到 {len(jobs)} 个职位")
+                    
+                    if finished:
+                        break
+                
+                # 并发模式下已尝试到max_pages或到达末页
+                current_url = None
+            
             processing_time = time.time() - start_time
             
             return CrawlResult(
@@ -229,33 +362,18 @@ class BrowserController:
                 processing_time=processing_time
             )
     
-    async def _wait_for_page_load(self, page: Page) -> None:
-        """等待页面加载完成"""
+    async def _wait_for_page_load(self, page: Page, ready_selector: str) -> None:
+        """等待目标内容出现（以选择器为就绪信号，不等待网络空闲）"""
         try:
-            # 等待网络空闲
-            await page.wait_for_load_state("networkidle", timeout=15000)
-            
-            # 等待常见的加载指示器消失
-            loading_selectors = [
-                ".loading", ".spinner", ".loader", "[data-loading]",
-                ".loading-indicator", ".progress", ".skeleton"
-            ]
+            await page.wait_for_selector(ready_selector, state="attached", timeout=10000)
             
-            for selector in loading_selectors:
-                try:
-                    await page.wait_for_selector(
-                        selector, 
-                        state="hidden", 
-                        timeout=5000
-                    )
-                except PlaywrightTimeoutError:
-                    continue  # 如果没有这个加载器，继续下一个
-            
-            # 额外等待时间确保动态内容加载
-            await asyncio.sleep(2)
+            # 等待加载指示器消失（轮询在页面内完成，不存在时立即返回）
+            await page.wait_for_function(
+                LOADING_INDICATORS_HIDDEN_SCRIPT, arg=LOADING_INDICATOR_SELECTOR, timeout=3000
+            )
             
         except PlaywrightTimeoutError:
-            logger.warning("页面加载等待超时，继续执行")
+            logger.warning(f"页面加载等待超时，继续执行: {ready_selector}")
         except Exception as e:
             logger.warning(f"页面加载等待异常: {e}")
     
@@ -269,14 +387,15 @@ class BrowserController:
             # 生成截图文件名
             timestamp = int(time.time())
             domain = url.split("//")[1].split("/")[0].replace(".", "_")
-            filename = f"{domain}_{timestamp}.png"
+            filename = f"{domain}_{timestamp}.jpg"
             screenshot_path = screenshot_dir / filename
             
-            # 截图
+            # 截图（默认只截取视口并使用JPEG，调试时可开启整页截图）
             await page.screenshot(
                 path=str(screenshot_path),
-                full_page=True,
-                type="png"
+                full_page=settings.screenshot_full_page,
+                type="jpeg",
+                quality=60
             )
             
             return str(screenshot_path)
@@ -288,37 +407,57 @@ class BrowserController:
     async def test_selectors(self, url: str, selectors: Dict[str, str]) -> Dict[str, Any]:
         """测试选择器有效性"""
         try:
-            # 加载页面
-            page_result = await self.load_page(url, wait_for_load=True)
+            stats = None
+            crawler_agent = CrawlerAgent(self.browser)
             
-            if not page_result.success:
-                return {
-                    "success": False,
-                    "error": page_result.error_message,
-                    "results": {}
-                }
+            if self.current_page and self.current_page.url == url:
+                # 当前页面已加载该URL，直接复用已有DOM
+                stats = await crawler_agent.query_selector_stats(
+                    self.current_page, list(selectors.values())
+                )
+            else:
+                # 优先直接请求HTML测试，所有选择器都能在静态HTML中命中时无需渲染页面
+                html_content = await self.fetch_html_fast(url)
+                if html_content:
+                    stats = await asyncio.to_thread(
+                        self._static_selector_stats, html_content, list(selectors.values())
+                    )
             
-            # 创建爬虫代理测试
-            crawler_agent = CrawlerAgent(self.browser)
+            if stats is None:
+                # 加载页面
+                page_result = await self.load_page(
+                    url, wait_for_load=True, ready_selector=selectors.get("jobItem")
+                )
+                
+                if not page_result.success:
+                    return {
+                        "success": False,
+                        "error": page_result.error_message,
+                        "results": {}
+                    }
+                
+                # 测试每个选择器（在页面内批量统计，重复选择器只查询一次）
+                stats = await crawler_agent.query_selector_stats(
+                    self.current_page, list(selectors.values())
+                )
             
-            # 测试每个选择器
             test_results = {}
             
             for key, selector in selectors.items():
-                try:
-                    elements = await self.current_page.query_selector_all(selector)
+                stat = stats.get(selector, {"count": 0, "sample_text": ""})
+                if "error" in stat:
                     test_results[key] = {
-                        "valid": len(elements) > 0,
-                        "count": len(elements),
+                        "valid": False,
+                        "count": 0,
                         "selector": selector,
-                        "sample_text": elements[0].inner_text()[:100] if elements else ""
+                        "error": stat["error"]
                     }
-                except Exception as e:
+                else:
                     test_results[key] = {
-                        "valid": False,
-                        "count": 0,
+                        "valid": stat["count"] > 0,
+                        "count": stat["count"],
                         "selector": selector,
-                        "error": str(e)
+                        "sample_text": stat["sample_text"]
                     }
             
             # 计算整体评分
@@ -340,34 +479,60 @@ class BrowserController:
                 "results": {}
             }
     
+    async def fetch_html_fast(self, url: str) -> Optional[str]:
+        """通过上下文的请求接口直接获取HTML（共享Cookie、请求头与连接，不渲染页面）"""
+        try:
+            response = await self.context.request.get(url, timeout=settings.browser_timeout)
+            if not response.ok:
+                return None
+            return await response.text()
+            
+        except Exception as e:
+            logger.warning(f"直接获取HTML失败 {url}: {e}")
+            return None
+    
+    @staticmethod
+    def _static_selector_stats(html_content: str, selectors: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """在静态HTML中统计选择器匹配，任一选择器无法解析或未命中时返回None（需渲染页面）"""
+        soup = BeautifulSoup(html_content, HTML_PARSER)
+        stats = {}
+        for selector in dict.fromkeys(selectors):
+            try:
+                elements = compile_selector(selector).select(soup)
+            except Exception:
+                return None
+            if not elements:
+                return None
+            stats[selector] = {
+                "count": len(elements),
+                "sample_text": elements[0].get_text(" ", strip=True)[:SAMPLE_TEXT_LENGTH]
+            }
+        return stats
+    
     async def handle_anti_bot_challenge(self, page: Page) -> bool:
         """处理反爬虫挑战"""
         try:
             # 检测常见的反爬虫页面
-            challenge_indicators = [
-                "captcha", "robot", "verify", "protection",
-                "cloudflare", "please wait", "checking browser"
-            ]
-            
             page_content = await page.content()
-            page_text = page_content.lower()
             
-            for indicator in challenge_indicators:
-                if indicator in page_text:
-                    logger.warning(f"检测到反爬虫挑战: {indicator}")
-                    
-                    # 尝试等待挑战完成
-                    await asyncio.sleep(5)
-                    
-                    # 检查是否已经通过
-                    new_content = await page.content()
-                    if len(new_content) > len(page_content) * 1.5:
-                        logger.info("反爬虫挑战可能已通过")
-                        return True
-                    
-                    return False
+            match = CHALLENGE_INDICATOR_RE.search(page_content)
+            if not match:
+                return True  # 没有检测到挑战
+            
+            logger.warning(f"检测到反爬虫挑战: {match.group(0).lower()}")
+            
+            # 尝试等待挑战完成
+            await asyncio.sleep(5)
             
-            return True  # 没有检测到挑战
+            # 检查是否已经通过（只需比较长度，在页面内计算而不传回完整HTML）
+            new_content_length = await page.evaluate(
+                "document.documentElement.outerHTML.length"
+            )
+            if new_content_length > len(page_content) * 1.5:
+                logger.info("反爬虫挑战可能已通过")
+                return True
+            
+            return False
             
         except Exception as e:
             logger.error(f"反爬虫挑战处理失败: {e}")
@@ -380,6 +545,10 @@ class BrowserController:
                 await self.current_page.close()
                 self.current_page = None
             
+            if self.context:
+                await self.context.close()
+                self.context = None
+            
             if self.browser:
                 await self.browser.close()
                 self.browser = None
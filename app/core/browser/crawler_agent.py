@@ -1,9 +1,10 @@
 """爬虫代理"""
 
 import json
-import asyncio
-from typing import Dict, Any, List, Optional
-from urllib.parse import urljoin, urlparse
+import textwrap
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from playwright.async_api import Page
 from browser_use import Agent, Browser
 from app.config import settings
@@ -11,6 +12,177 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class JobRecord:
+    """提取到的职位记录"""
+    title: str = ""
+    company: str = ""
+    location: str = ""
+    published_at: str = ""
+    description: str = ""
+    link: str = ""
+    raw_html: Optional[str] = None
+
+
+# 职位字段与选择器键的对应关系
+JOB_FIELD_MAPPING = {
+    "title": "jobTitle",
+    "company": "companyName",
+    "location": "location",
+    "published_at": "publishedAt",
+    "description": "jobDescription",
+    "link": "jobLink"
+}
+
+# 职位提取脚本模板：对职位列表元素一次性提取所有职位（避免逐字段的CDP往返），
+# 职位项与字段选择器在生成时直接写入脚本，链接按文档基址补全为绝对URL
+JOB_EXTRACTION_TEMPLATE = textwrap.dedent("""
+    (lists) => {
+        const readText = (item, selector) => {
+            try {
+                const element = item.querySelector(selector);
+                return element ? (element.innerText || '').trim() : '';
+            } catch (e) {
+                return '';
+            }
+        };
+        const readLink = (item, selector) => {
+            try {
+                const element = item.querySelector(selector);
+                const href = element ? element.getAttribute('href') : null;
+                if (!href) {
+                    return '';
+                }
+                try {
+                    return new URL(href, document.baseURI).href;
+                } catch (e) {
+                    return href;
+                }
+            } catch (e) {
+                return '';
+            }
+        };
+        const jobs = [];
+        for (const list of lists) {
+            for (const item of list.querySelectorAll(__JOB_ITEM__)) {
+                const job = {__FIELDS__};
+                // 跳过无效的职位项
+                if (!job.title && !job.company) {
+                    continue;
+                }
+                __RAW_HTML__
+                jobs.push(job);
+            }
+        }
+        return { found: lists.length > 0, jobs };
+    }
+""").strip()
+
+
+@lru_cache(maxsize=128)
+def build_job_extraction_script(job_item_selector: str, field_selectors: Tuple[Tuple[str, str], ...],
+                                include_raw_html: bool = False) -> str:
+    """生成特定站点选择器的职位提取脚本（同一次爬取的各页选择器相同，按选择器缓存）"""
+    fields = ", ".join(
+        f"{json.dumps(field)}: {'readLink' if field == 'link' else 'readText'}"
+        f"(item, {json.dumps(selector, ensure_ascii=False)})"
+        for field, selector in field_selectors
+    )
+    return (
+        JOB_EXTRACTION_TEMPLATE
+        .replace("__JOB_ITEM__", json.dumps(job_item_selector, ensure_ascii=False))
+        .replace("__FIELDS__", fields)
+        .replace("__RAW_HTML__", "job.raw_html = item.innerHTML;" if include_raw_html else "")
+    )
+
+
+# 选择器测试返回的示例文本最大长度
+SAMPLE_TEXT_LENGTH = 100
+
+# 页面内批量统计选择器匹配数量与首个元素文本（在页面内截断），非标准CSS选择器返回null交由Playwright处理
+SELECTOR_STATS_SCRIPT = textwrap.dedent("""
+    ({ selectors, sampleLength }) => selectors.map((selector) => {
+        let elements;
+        try {
+            elements = document.querySelectorAll(selector);
+        } catch (e) {
+            return null;
+        }
+        return {
+            count: elements.length,
+            sample_text: elements.length ? (elements[0].innerText || '').slice(0, sampleLength) : '',
+        };
+    })
+""").strip()
+
+# 页面内一次性检查所有下一页回退规则：先按顺序检查CSS选择器，再按顺序检查链接文本
+# （与Playwright的:has-text一致，忽略大小写并合并空白），返回命中的规则类型与下标
+NEXT_PAGE_FALLBACK_SCRIPT = textwrap.dedent("""
+    ({ selectors, texts }) => {
+        const selectorIndex = selectors.findIndex((selector) => {
+            try {
+                return document.querySelector(selector) !== null;
+            } catch (e) {
+                return false;
+            }
+        });
+        if (selectorIndex >= 0) {
+            return ['selector', selectorIndex];
+        }
+        const linkTexts = Array.from(
+            document.querySelectorAll('a'),
+            (link) => (link.textContent || '').replace(/\\s+/g, ' ').toLowerCase()
+        );
+        const textIndex = texts.findIndex(
+            (text) => linkTexts.some((linkText) => linkText.includes(text.toLowerCase()))
+        );
+        return textIndex >= 0 ? ['text', textIndex] : null;
+    }
+""").strip()
+
+# 页面内统计元数据，page_size为序列化HTML的长度
+PAGE_METADATA_SCRIPT = textwrap.dedent("""
+    () => {
+        const metaDescription = document.querySelector('meta[name="description"]');
+        return {
+            title: document.title,
+            meta_description: (metaDescription && metaDescription.getAttribute('content')) || '',
+            total_links: document.querySelectorAll('a').length,
+            total_images: document.querySelectorAll('img').length,
+            page_size: document.documentElement.outerHTML.length,
+        };
+    }
+""").strip()
+
+# 一次读取下一页候选元素的状态与链接（链接按文档基址补全为绝对URL）
+NEXT_ELEMENT_INFO_SCRIPT = textwrap.dedent("""
+    (element) => {
+        const href = element.getAttribute('href');
+        let url = null;
+        if (href) {
+            try {
+                url = new URL(href, document.baseURI).href;
+            } catch (e) {
+                url = href;
+            }
+        }
+        return {
+            disabled: element.hasAttribute('disabled'),
+            class_name: element.getAttribute('class') || '',
+            href: url,
+        };
+    }
+""").strip()
+
+# 常见的下一页回退规则：CSS选择器，以及链接文本（对应Playwright的 a:has-text(...)）
+NEXT_PAGE_CSS_FALLBACKS = [
+    'a[aria-label*="next"]',
+    'a[aria-label*="下一页"]',
+    '.next:not(.disabled)',
+    '[data-page="next"]',
+]
+NEXT_PAGE_TEXT_FALLBACKS = ["Next", "下一页", ">"]
+
 
 class CrawlerAgent:
     """爬虫代理"""
@@ -18,38 +190,38 @@ class CrawlerAgent:
     def __init__(self, browser: Browser):
         self.browser = browser
         
-    async def extract_jobs(self, page: Page, selectors: Dict[str, str]) -> Dict[str, Any]:
-        """提取职位信息"""
+    async def extract_jobs(self, page: Page, selectors: Dict[str, str],
+                           include_raw_html: bool = False) -> Dict[str, Any]:
+        """提取职位信息（include_raw_html为True时附带职位项的原始HTML）"""
         try:
             logger.info("开始提取职位信息")
             
-            # 等待页面加载完成
-            await self._wait_for_content_load(page)
-            
             # 检查职位列表是否存在
             job_list_selector = selectors.get("jobList", "")
             if not job_list_selector:
                 return {"success": False, "error": "缺少职位列表选择器", "jobs": []}
             
-            job_list_elements = await page.query_selector_all(job_list_selector)
-            if not job_list_elements:
-                return {"success": False, "error": f"未找到职位列表: {job_list_selector}", "jobs": []}
-            
             # 提取职位项
             job_item_selector = selectors.get("jobItem", "")
             if not job_item_selector:
                 return {"success": False, "error": "缺少职位项选择器", "jobs": []}
             
-            # 在职位列表中查找职位项
-            jobs = []
-            for job_list in job_list_elements:
-                job_items = await job_list.query_selector_all(job_item_selector)
-                
-                for job_item in job_items:
-                    job_data = await self._extract_single_job(job_item, selectors, page)
-                    if job_data:
-                        jobs.append(job_data)
+            # 等待职位项出现
+            await self._wait_for_content_load(page, job_item_selector)
+            
+            # 在页面内一次性完成列表、职位项与各字段的查询
+            extraction_script = build_job_extraction_script(job_item_selector, tuple(
+                (field, selectors[selector_key])
+                for field, selector_key in JOB_FIELD_MAPPING.items()
+                if selectors.get(selector_key)
+            ), include_raw_html)
+            # 职位列表由Playwright匹配（支持Playwright选择器语法），其余在同一次调用中完成
+            result = await page.eval_on_selector_all(job_list_selector, extraction_script)
             
+            if not result["found"]:
+                return {"success": False, "error": f"未找到职位列表: {job_list_selector}", "jobs": []}
+            
+            jobs = [JobRecord(**job) for job in result["jobs"]]
             logger.info(f"成功提取 {len(jobs)} 个职位")
             
             return {
@@ -66,84 +238,6 @@ class CrawlerAgent:
                 "jobs": []
             }
     
-    async def _extract_single_job(self, job_element, selectors: Dict[str, str], page: Page) -> Optional[Dict[str, Any]]:
-        """提取单个职位信息"""
-        try:
-            job_data = {}
-            
-            # 提取各个字段
-            field_mapping = {
-                "title": "jobTitle",
-                "company": "companyName", 
-                "location": "location",
-                "published_at": "publishedAt",
-                "description": "jobDescription",
-                "link": "jobLink"
-            }
-            
-            for field, selector_key in field_mapping.items():
-                selector = selectors.get(selector_key, "")
-                if selector:
-                    value = await self._extract_field_value(job_element, selector, field, page)
-                    job_data[field] = value
-            
-            # 验证必需字段
-            if not job_data.get("title") and not job_data.get("company"):
-                return None  # 跳过无效的职位项
-            
-            # 处理链接
-            if job_data.get("link"):
-                job_data["link"] = await self._normalize_url(job_data["link"], page.url)
-            
-            # 添加原始数据
-            job_data["raw_html"] = await job_element.inner_html()
-            
-            return job_data
-            
-        except Exception as e:
-            logger.warning(f"提取单个职位失败: {e}")
-            return None
-    
-    async def _extract_field_value(self, job_element, selector: str, field_type: str, page: Page) -> str:
-        """提取字段值"""
-        try:
-            # 在职位元素内查找
-            element = await job_element.query_selector(selector)
-            
-            if not element:
-                return ""
-            
-            # 根据字段类型提取内容
-            if field_type == "link":
-                # 提取href属性
-                href = await element.get_attribute("href")
-                return href or ""
-            else:
-                # 提取文本内容
-                text = await element.inner_text()
-                return text.strip() if text else ""
-                
-        except Exception as e:
-            logger.warning(f"字段提取失败 {field_type}[{selector}]: {e}")
-            return ""
-    
-    async def _normalize_url(self, url: str, base_url: str) -> str:
-        """标准化URL"""
-        try:
-            if not url:
-                return ""
-            
-            # 如果是完整URL，直接返回
-            if url.startswith(("http://", "https://")):
-                return url
-            
-            # 如果是相对URL，拼接基础URL
-            return urljoin(base_url, url)
-            
-        except Exception as e:
-            logger.warning(f"URL标准化失败: {e}")
-            return url
-    
     async def find_next_page(self, page: Page, next_page_selector: str) -> Dict[str, Any]:
         """查找下一页"""
         try:
@@ -154,45 +248,39 @@ class CrawlerAgent:
             next_elements = await page.query_selector_all(next_page_selector)
             
             if not next_elements:
-                # 尝试常见的下一页选择器
-                fallback_selectors = [
-                    'a[aria-label*="next"]',
-                    'a[aria-label*="下一页"]',
-                    '.next:not(.disabled)',
-                    '[data-page="next"]',
-                    'a:has-text("Next")',
-                    'a:has-text("下一页")',
-                    'a:has-text(">")'
-                ]
-                
-                for fallback in fallback_selectors:
+                # 尝试常见的下一页规则（所有规则在页面内一次检查，只为命中的规则获取元素）
+                match = await page.evaluate(NEXT_PAGE_FALLBACK_SCRIPT, {
+                    "selectors": NEXT_PAGE_CSS_FALLBACKS,
+                    "texts": NEXT_PAGE_TEXT_FALLBACKS,
+                })
+                if match:
+                    kind, index = match
+                    if kind == "selector":
+                        fallback = NEXT_PAGE_CSS_FALLBACKS[index]
+                    else:
+                        fallback = f'a:has-text("{NEXT_PAGE_TEXT_FALLBACKS[index]}")'
                     next_elements = await page.query_selector_all(fallback)
-                    if next_elements:
-                        break
             
             if not next_elements:
                 return {"has_next": False, "next_url": None, "error": "未找到下一页元素"}
             
             # 选择第一个可用的下一页元素
             next_element = None
+            next_url = None
             for element in next_elements:
-                # 检查元素是否可点击（不是disabled状态）
-                is_disabled = await element.get_attribute("disabled")
-                class_attr = await element.get_attribute("class") or ""
+                # 检查元素是否可点击（不是disabled状态），状态与链接一次读取
+                info = await element.evaluate(NEXT_ELEMENT_INFO_SCRIPT)
                 
-                if not is_disabled and "disabled" not in class_attr.lower():
+                if not info["disabled"] and "disabled" not in info["class_name"].lower():
                     next_element = element
+                    next_url = info["href"]
                     break
             
             if not next_element:
                 return {"has_next": False, "next_url": None, "error": "下一页元素不可用"}
             
-            # 获取下一页URL
-            href = await next_element.get_attribute("href")
-            
-            if href:
-                # 有href属性，直接获取URL
-                next_url = await self._normalize_url(href, page.url)
+            if next_url:
+                # 有href属性，直接使用补全后的URL
                 return {"has_next": True, "next_url": next_url}
             else:
                 # 没有href，尝试点击触发导航
@@ -216,26 +304,10 @@ class CrawlerAgent:
             logger.error(f"查找下一页失败: {e}")
             return {"has_next": False, "next_url": None, "error": str(e)}
     
-    async def _wait_for_content_load(self, page: Page) -> None:
-        """等待内容加载完成"""
+    async def _wait_for_content_load(self, page: Page, ready_selector: str) -> None:
+        """等待职位项出现（已存在时立即返回）"""
         try:
-            # 等待网络空闲
-            await page.wait_for_load_state("networkidle", timeout=15000)
-            
-            # 等待常见的加载指示器消失
-            loading_selectors = [
-                ".loading", ".spinner", ".loader", "[data-loading]",
-                ".skeleton", ".placeholder", ".loading-indicator"
-            ]
-            
-            for selector in loading_selectors:
-                try:
-                    await page.wait_for_selector(selector, state="hidden", timeout=3000)
-                except:
-                    continue
-            
-            # 额外等待，确保动态内容渲染
-            await asyncio.sleep(1)
+            await page.wait_for_selector(ready_selector, state="attached", timeout=10000)
             
         except Exception as e:
             logger.warning(f"等待内容加载失败: {e}")
@@ -250,6 +322,9 @@ class CrawlerAgent:
         
         try:
             required_selectors = ["jobList", "jobItem", "jobTitle"]
+            stats = await self.query_selector_stats(
+                page, [selectors.get(key, "") for key in required_selectors]
+            )
             
             for key in required_selectors:
                 selector = selectors.get(key, "")
@@ -257,14 +332,18 @@ class CrawlerAgent:
                     validation_result["errors"].append(f"缺少必需选择器: {key}")
                     continue
                 
-                elements = await page.query_selector_all(selector)
+                stat = stats[selector]
+                if "error" in stat:
+                    raise RuntimeError(stat["error"])
+                
+                found = stat["count"]
                 validation_result["selectors"][key] = {
                     "selector": selector,
-                    "found": len(elements),
-                    "valid": len(elements) > 0
+                    "found": found,
+                    "valid": found > 0
                 }
                 
-                if len(elements) == 0:
+                if found == 0:
                     validation_result["errors"].append(f"选择器无效: {key}[{selector}]")
             
             # 检查职位项数量是否合理
@@ -282,37 +361,44 @@ class CrawlerAgent:
             validation_result["errors"].append(f"验证过程出错: {e}")
             return validation_result
     
+    async def query_selector_stats(self, page: Page, selectors: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量统计选择器的匹配数量与首个元素文本（重复选择器只查询一次）"""
+        unique_selectors = list(dict.fromkeys(selector for selector in selectors if selector))
+        if not unique_selectors:
+            return {}
+        
+        page_stats = await page.evaluate(SELECTOR_STATS_SCRIPT, {
+            "selectors": unique_selectors,
+            "sampleLength": SAMPLE_TEXT_LENGTH,
+        })
+        
+        stats = {}
+        for selector, stat in zip(unique_selectors, page_stats):
+            if stat is None:
+                # 非标准CSS（如Playwright的:has-text），交回Playwright查询
+                try:
+                    elements = await page.query_selector_all(selector)
+                    stat = {
+                        "count": len(elements),
+                        "sample_text": (await elements[0].inner_text())[:SAMPLE_TEXT_LENGTH] if elements else ""
+                    }
+                except Exception as e:
+                    stat = {"count": 0, "sample_text": "", "error": str(e)}
+            stats[selector] = stat
+        
+        return stats
+    
     async def extract_page_metadata(self, page: Page) -> Dict[str, Any]:
         """提取页面元数据"""
         try:
-            metadata = {
+            # 标题、meta描述、链接/图片数量与页面大小在页面内一次性统计，无需传回完整HTML
+            page_stats = await page.evaluate(PAGE_METADATA_SCRIPT)
+            
+            return {
                 "url": page.url,
-                "title": await page.title(),
-                "meta_description": "",
-                "total_links": 0,
-                "total_images": 0,
-                "page_size": 0
+                **page_stats
             }
             
-            # 获取meta描述
-            meta_desc = await page.query_selector('meta[name="description"]')
-            if meta_desc:
-                metadata["meta_description"] = await meta_desc.get_attribute("content") or ""
-            
-            # 统计链接和图片数量
-            links = await page.query_selector_all("a")
-            images = await page.query_selector_all("img")
-            
-            metadata["total_links"] = len(links)
-            metadata["total_images"] = len(images)
-            
-            # 获取页面大小
-            content = await page.content()
-            metadata["page_size"] = len(content)
-            
-            return metadata
-            
         except Exception as e:
             logger.warning(f"提取页面元数据失败: {e}")
             return {}
-
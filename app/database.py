@@ -1,18 +1,28 @@
 """数据库配置和连接管理"""
 
 import asyncio
-from typing import AsyncGenerator
-from sqlalchemy import create_engine, text
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
+import orjson
+from sqlalchemy import create_engine, delete as sa_delete, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from redis import Redis
 from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.client import Pipeline
 from app.config import settings
 from app.models.base import Base
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _json_serializer(value: Any) -> str:
+    """JSON列序列化（orjson，原生支持dataclass与datetime）"""
+    return orjson.dumps(value).decode()
+
+
 # 同步数据库引擎
 engine = create_engine(
     settings.database_url.replace("+aiomysql", "+pymysql"),
@@ -20,25 +30,30 @@ engine = create_engine(
     pool_size=10,
     max_overflow=20,
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=3600,
+    json_serializer=_json_serializer
 )
 
-# 异步数据库引擎
+# 异步数据库引擎（连接池大小按并发任务数配置）
 async_engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
-    pool_size=10,
-    max_overflow=20,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=3600,
+    json_serializer=_json_serializer
 )
 
-# 会话工厂
+# 会话工厂（提交后不使对象过期，避免提交后访问属性时逐个重新查询）
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
-    class_=Session
+    class_=Session,
+    expire_on_commit=False
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -47,9 +62,9 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
-# Redis连接
-redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
-async_redis_client = AsyncRedis.from_url(settings.redis_url, decode_responses=True)
+# Redis连接（返回原始bytes，由调用方按需解码；JSON值可直接交给orjson）
+redis_client = Redis.from_url(settings.redis_url, decode_responses=False)
+async_redis_client = AsyncRedis.from_url(settings.redis_url, decode_responses=False)
 
 
 class DatabaseManager:
@@ -97,6 +112,24 @@ class DatabaseManager:
             logger.error(f"数据库连接检查失败: {e}")
             return False
     
+    async def warm_up_pools(self) -> None:
+        """预热连接池：并发建立pool_size个数据库连接与同等数量的Redis连接后归还，避免首批请求建连"""
+        try:
+            results = await asyncio.gather(
+                *(self.async_engine.connect() for _ in range(settings.db_pool_size)),
+                return_exceptions=True
+            )
+            connections = [conn for conn in results if not isinstance(conn, Exception)]
+            # 关闭即归还到连接池，连接保持打开
+            await asyncio.gather(*(conn.close() for conn in connections))
+            
+            await asyncio.gather(
+                *(async_redis_client.ping() for _ in range(settings.db_pool_size))
+            )
+            logger.info(f"连接池预热完成: 数据库连接 {len(connections)} 个")
+        except Exception as e:
+            logger.warning(f"连接池预热失败: {e}")
+    
     async def check_redis_connection(self) -> bool:
         """检查Redis连接"""
         try:
@@ -166,6 +199,19 @@ class DatabaseService:
         """删除实例"""
         await self.db.delete(instance)
     
+    async def delete_many(self, model, ids: List[Any]) -> int:
+        """按主键批量删除（单条DELETE语句），返回删除行数
+
+        使用 synchronize_session=False：已加载到当前会话的对象不会从标识映射中移除，
+        删除后不要再访问或刷新这些对象；需要同步会话状态时使用 delete()。
+        """
+        if not ids:
+            return 0
+        result = await self.db.execute(
+            sa_delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+    
     async def flush(self) -> None:
         """刷新到数据库"""
         await self.db.flush()
@@ -185,14 +231,19 @@ class RedisService:
             logger.error(f"Redis设置失败: {e}")
             return False
     
-    async def get(self, key: str) -> str:
-        """获取值"""
+    async def get(self, key: str) -> Optional[bytes]:
+        """获取原始值"""
         try:
             return await self.redis.get(key)
         except Exception as e:
             logger.error(f"Redis获取失败: {e}")
             return None
     
+    async def get_str(self, key: str) -> Optional[str]:
+        """获取值并解码为字符串"""
+        value = await self.get(key)
+        return value.decode() if value is not None else None
+    
     async def delete(self, key: str) -> bool:
         """删除键"""
         try:
@@ -233,7 +284,7 @@ class RedisService:
             logger.error(f"Redis哈希设置失败: {e}")
             return 0
     
-    async def hget(self, name: str, key: str) -> str:
+    async def hget(self, name: str, key: str) -> Optional[bytes]:
         """获取哈希值"""
         try:
             return await self.redis.hget(name, key)
@@ -248,6 +299,68 @@ class RedisService:
         except Exception as e:
             logger.error(f"Redis哈希获取全部失败: {e}")
             return {}
+    
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Pipeline]:
+        """管道上下文，退出时一次性发送排队的命令（单次往返）"""
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            await pipe.execute()
+    
+    async def mset_many(self, mapping: Dict[str, str], expire: int = None) -> bool:
+        """批量设置键值（单次往返）"""
+        if not mapping:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.set(key, value, ex=expire)
+                return all(await pipe.execute())
+        except Exception as e:
+            logger.error(f"Redis批量设置失败: {e}")
+            return False
+    
+    async def mget_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """批量获取值（单次往返）"""
+        if not keys:
+            return []
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.get(key)
+                return await pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis批量获取失败: {e}")
+            return [None] * len(keys)
+    
+    async def hset_many(self, mappings: Dict[str, dict]) -> int:
+        """批量设置多个哈希（单次往返），返回新增字段总数"""
+        if not mappings:
+            return 0
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for name, mapping in mappings.items():
+                    pipe.hset(name, mapping=mapping)
+                return sum(await pipe.execute())
+        except Exception as e:
+            logger.error(f"Redis批量哈希设置失败: {e}")
+            return 0
+    
+    async def incr_with_expire(self, key: str, seconds: int) -> Optional[int]:
+        """递增固定窗口计数器（单次往返，常用于限流计数）
+
+        过期时间只在窗口的第一次计数时设置（EXPIRE NX，需要Redis 7），后续递增不会顺延窗口。
+        Redis不可用时返回None，调用方不能把失败当成未超限。
+        """
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, seconds, nx=True)
+                count, _ = await pipe.execute()
+                return count
+        except Exception as e:
+            logger.error(f"Redis递增并设置过期失败: {e}")
+            return None
 
 
 # 全局服务实例
@@ -270,6 +383,9 @@ async def init_database():
         # 创建表
         await db_manager.create_tables_async()
         
+        # 预热连接池
+        await db_manager.warm_up_pools()
+        
         logger.info("数据库初始化完成")
         
     except Exception as e:
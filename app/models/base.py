@@ -2,7 +2,7 @@
 
 import uuid
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, List, Tuple
 from sqlalchemy import Column, String, DateTime, text
 from sqlalchemy.types import TypeDecorator, CHAR
 from sqlalchemy.dialects.mysql import CHAR as MySQLCHAR
@@ -16,6 +16,11 @@ class GUID(TypeDecorator):
     impl = CHAR
     cache_ok = True
 
+    def __init__(self, as_string: bool = False):
+        # as_string=True 时查询结果直接返回字符串，省去构造uuid.UUID的开销
+        self.as_string = as_string
+        super().__init__()
+
     def load_dialect_impl(self, dialect):
         if dialect.name == 'mysql':
             return dialect.type_descriptor(MySQLCHAR(36))
@@ -27,16 +32,40 @@ class GUID(TypeDecorator):
             return value
         elif isinstance(value, uuid.UUID):
             return str(value)
+        elif isinstance(value, str) and len(value) == 36 and value.count('-') == 4:
+            # 已是标准格式的UUID字符串，无需重新解析
+            return value
         else:
             return str(uuid.UUID(value))
 
     def process_result_value(self, value, dialect):
-        if value is None:
+        if value is None or self.as_string:
             return value
         else:
             return uuid.UUID(value)
 
 
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if value is not None else None
+
+
+def _to_str(value: Any) -> Any:
+    return str(value) if value is not None else None
+
+
+def _converter_for(column_type: Any) -> Callable[[Any], Any]:
+    """按列类型选择to_dict的值转换函数"""
+    if isinstance(column_type, DateTime):
+        return _isoformat
+    if isinstance(column_type, GUID):
+        return _to_str
+    return _identity
+
+
 class Base(DeclarativeBase):
     """数据模型基类"""
     pass
@@ -69,17 +98,20 @@ class BaseModel(Base):
         comment="更新时间"
     )
     
+    # (列名, 转换函数) 列表，子类映射完成后按列类型预先生成
+    _to_dict_cols: List[Tuple[str, Callable[[Any], Any]]] = []
+    
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        table = cls.__dict__.get("__table__")
+        if table is not None:
+            cls._to_dict_cols = [
+                (column.name, _converter_for(column.type)) for column in table.columns
+            ]
+    
     def to_dict(self) -> dict[str, Any]:
         """转换为字典"""
-        result = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, datetime):
-                value = value.isoformat()
-            elif isinstance(value, uuid.UUID):
-                value = str(value)
-            result[column.name] = value
-        return result
+        return {name: convert(getattr(self, name)) for name, convert in self._to_dict_cols}
     
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__}(id={self.id})>"
@@ -1,8 +1,9 @@
 """爬取日志模型"""
 
 from datetime import datetime
-from typing import Dict, Any, Optional
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, JSON
+from typing import Dict, Any, List, Optional
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, JSON, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from .base import GUID
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
@@ -34,7 +35,7 @@ class CrawlLog(BaseModel):
     
     __tablename__ = "crawl_logs"
     
-    session_id = Column(GUID(), ForeignKey("crawl_sessions.id"), nullable=False, comment="会话ID")
+    session_id = Column(GUID(as_string=True), ForeignKey("crawl_sessions.id"), nullable=False, comment="会话ID")
     
     log_level = Column(Enum(LogLevel), nullable=False, comment="日志级别")
     message = Column(Text, nullable=False, comment="日志消息")
@@ -140,4 +141,10 @@ class CrawlLog(BaseModel):
             page_url=page_url,
             context_data=context_data
         )
-
+    
+    @classmethod
+    async def bulk_insert(cls, session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """批量写入日志（单条INSERT语句，跳过ORM工作单元）"""
+        if not rows:
+            return
+        await session.execute(insert(cls), rows)
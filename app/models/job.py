@@ -13,8 +13,8 @@ class Job(BaseModel):
     
     __tablename__ = "jobs"
     
-    site_id = Column(GUID(), ForeignKey("job_sites.id"), nullable=False, comment="网站ID")
-    crawl_session_id = Column(GUID(), ForeignKey("crawl_sessions.id"), nullable=False, comment="爬取会话ID")
+    site_id = Column(GUID(as_string=True), ForeignKey("job_sites.id"), nullable=False, comment="网站ID")
+    crawl_session_id = Column(GUID(as_string=True), ForeignKey("crawl_sessions.id"), nullable=False, comment="爬取会话ID")
     
     # 基础职位信息
     title = Column(String(500), nullable=False, comment="职位标题")
@@ -1,6 +1,6 @@
 """招聘网站模型"""
 
-from sqlalchemy import Column, String, Boolean, Text
+from sqlalchemy import Column, String, Boolean, Text, bindparam, select
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -37,3 +37,6 @@ class JobSite(BaseModel):
         """验证URL是否属于此网站"""
         return self.domain in url
 
+
+# 按域名查询网站的预构建语句（分析与爬虫服务共用），域名通过bindparam在执行时传入
+SITE_BY_DOMAIN_STMT = select(JobSite).where(JobSite.domain == bindparam("domain"))
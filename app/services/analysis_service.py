@@ -4,12 +4,9 @@ import time
 from typing import Dict, Any, Optional
 from urllib.parse import urlparse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.core.ai.page_analyzer import PageAnalyzer
-from app.core.ai.selector_generator import SelectorGenerator
-from app.core.browser.browser_controller import BrowserController
-from app.models.job_site import JobSite
+from app.config import settings
+from app.models.job_site import JobSite, SITE_BY_DOMAIN_STMT
 from app.models.ai_analysis import AIAnalysisResult
 from app.models.selector_config import SelectorConfig as SelectorConfigModel
 import logging
@@ -21,8 +18,12 @@ class AnalysisService:
     """页面分析服务"""
     
     def __init__(self, db: AsyncSession):
+        # AI模块依赖OpenAI客户端，导入开销较大，仅在创建服务时加载
+        from app.core.ai.page_analyzer import PageAnalyzer
+        from app.core.ai.selector_generator import SelectorGenerator
+        
         self.db = db
-        self.page_analyzer = PageAnalyzer()
+        self.page_analyzer = PageAnalyzer(stream_responses=settings.openai_stream_responses)
         self.selector_generator = SelectorGenerator()
     
     async def analyze_page(self, url: str, options: Dict[str, Any], 
@@ -33,6 +34,7 @@ class AnalysisService:
             site = await self._get_or_create_site(url)
             
             # 2. 使用浏览器加载页面
+            from app.core.browser.browser_controller import BrowserController
             browser_controller = BrowserController()
             
             try:
@@ -106,8 +108,7 @@ class AnalysisService:
             domain = parsed_url.netloc.lower()
             
             # 查询是否已存在
-            stmt = select(JobSite).where(JobSite.domain == domain)
-            result = await self.db.execute(stmt)
+            result = await self.db.execute(SITE_BY_DOMAIN_STMT, {"domain": domain})
             site = result.scalar_one_or_none()
             
             if not site:
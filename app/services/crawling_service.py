@@ -2,23 +2,50 @@
 
 import json
 import os
-import pandas as pd
+import uuid
+from dataclasses import asdict
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, List, Optional
 from urllib.parse import urlparse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, select, func
 
-from app.models.job_site import JobSite
+from app.models.job_site import JobSite, SITE_BY_DOMAIN_STMT
 from app.models.crawl_session import CrawlSession, SessionStatus
 from app.models.job import Job
-from app.models.crawl_log import CrawlLog
+from app.models.crawl_log import CrawlLog, LogLevel
 from app.models.selector_config import SelectorConfig
 from app.config import settings
 import logging
 
+if TYPE_CHECKING:
+    from app.core.browser.crawler_agent import JobRecord
+
 logger = logging.getLogger(__name__)
 
+# 预构建的查询语句，参数通过bindparam在执行时传入
+_SESSION_BY_ID_STMT = select(CrawlSession).where(
+    CrawlSession.id == bindparam("session_id")
+)
+
+_SESSION_ID_STMT = select(CrawlSession.id).where(
+    CrawlSession.id == bindparam("session_id")
+)
+
+_RECENT_ERROR_LOGS_STMT = select(CrawlLog).where(
+    CrawlLog.session_id == bindparam("session_id"),
+    CrawlLog.log_level == "error"
+).order_by(CrawlLog.timestamp.desc()).limit(5)
+
+_JOBS_BY_SESSION_STMT = select(Job).where(
+    Job.crawl_session_id == bindparam("session_id")
+)
+
+_ACTIVE_SELECTOR_CONFIG_STMT = select(SelectorConfig).where(
+    SelectorConfig.site_id == bindparam("site_id"),
+    SelectorConfig.is_active == True
+).order_by(SelectorConfig.created_at.desc())
+
 
 class CrawlingService:
     """爬虫服务"""
@@ -60,13 +87,14 @@ class CrawlingService:
             await self.db.rollback()
             raise
     
-    async def save_crawl_results(self, session_id: str, jobs: List[Dict[str, Any]],
+    async def save_crawl_results(self, session_id: str, jobs: List["JobRecord"],
                                crawl_result: Any) -> None:
         """保存爬取结果"""
         try:
             # 获取会话
-            stmt = select(CrawlSession).where(CrawlSession.id == session_id)
-            result = await self.db.execute(stmt)
+            result = await self.db.execute(
+                _SESSION_BY_ID_STMT, {"session_id": session_id}
+            )
             session = result.scalar_one_or_none()
             
             if not session:
@@ -74,17 +102,17 @@ class CrawlingService:
             
             # 保存职位数据
             saved_jobs = 0
-            for job_data in jobs:
+            for job_record in jobs:
                 job = Job(
                     site_id=session.site_id,
                     crawl_session_id=session.id,
-                    title=job_data.get("title", ""),
-                    company_name=job_data.get("company", ""),
-                    job_link=job_data.get("link", ""),
-                    location=job_data.get("location", ""),
-                    job_description=job_data.get("description", ""),
-                    published_at=self._parse_date(job_data.get("published_at")),
-                    raw_data=job_data
+                    title=job_record.title,
+                    company_name=job_record.company,
+                    job_link=job_record.link,
+                    location=job_record.location,
+                    job_description=job_record.description,
+                    published_at=self._parse_date(job_record.published_at),
+                    raw_data=asdict(job_record)
                 )
                 
                 # 计算数据质量评分
@@ -115,8 +143,9 @@ class CrawlingService:
         """处理爬取失败"""
         try:
             # 获取会话
-            stmt = select(CrawlSession).where(CrawlSession.id == session_id)
-            result = await self.db.execute(stmt)
+            result = await self.db.execute(
+                _SESSION_BY_ID_STMT, {"session_id": session_id}
+            )
             session = result.scalar_one_or_none()
             
             if session:
@@ -124,13 +153,11 @@ class CrawlingService:
                 session.complete_session(success=False)
                 session.errors_count = len(errors)
                 
-                # 记录错误日志
-                for error in errors:
-                    log = CrawlLog.create_error_log(
-                        session_id=session_id,
-                        message=error
-                    )
-                    self.db.add(log)
+                # 记录错误日志（一次批量写入）
+                await CrawlLog.bulk_insert(self.db, [
+                    {"session_id": session_id, "log_level": LogLevel.ERROR, "message": error}
+                    for error in errors
+                ])
                 
                 await self.db.commit()
                 
@@ -143,20 +170,18 @@ class CrawlingService:
     async def get_session_status(self, session_id: str) -> Optional[Dict[str, Any]]:
         """获取会话状态"""
         try:
-            stmt = select(CrawlSession).where(CrawlSession.id == session_id)
-            result = await self.db.execute(stmt)
+            result = await self.db.execute(
+                _SESSION_BY_ID_STMT, {"session_id": session_id}
+            )
             session = result.scalar_one_or_none()
             
             if not session:
                 return None
             
             # 获取最近的错误日志
-            log_stmt = select(CrawlLog).where(
-                CrawlLog.session_id == session_id,
-                CrawlLog.log_level == "error"
-            ).order_by(CrawlLog.timestamp.desc()).limit(5)
-            
-            log_result = await self.db.execute(log_stmt)
+            log_result = await self.db.execute(
+                _RECENT_ERROR_LOGS_STMT, {"session_id": session_id}
+            )
             error_logs = log_result.scalars().all()
             
             return {
@@ -176,11 +201,22 @@ class CrawlingService:
             logger.error(f"获取会话状态失败: {e}")
             return None
     
+    async def session_exists(self, session_id: str) -> bool:
+        """检查会话是否存在（只查询主键）"""
+        try:
+            uuid.UUID(session_id)
+        except ValueError:
+            return False
+        
+        result = await self.db.execute(_SESSION_ID_STMT, {"session_id": session_id})
+        return result.scalar_one_or_none() is not None
+    
     async def cancel_session(self, session_id: str) -> None:
         """取消会话"""
         try:
-            stmt = select(CrawlSession).where(CrawlSession.id == session_id)
-            result = await self.db.execute(stmt)
+            result = await self.db.execute(
+                _SESSION_BY_ID_STMT, {"session_id": session_id}
+            )
             session = result.scalar_one_or_none()
             
             if session:
@@ -234,8 +270,9 @@ class CrawlingService:
         """导出会话数据"""
         try:
             # 获取会话数据
-            stmt = select(Job).where(Job.crawl_session_id == session_id)
-            result = await self.db.execute(stmt)
+            result = await self.db.execute(
+                _JOBS_BY_SESSION_STMT, {"session_id": session_id}
+            )
             jobs = result.scalars().all()
             
             if not jobs:
@@ -257,10 +294,12 @@ class CrawlingService:
                     json.dump(export_data, f, ensure_ascii=False, indent=2)
             
             elif format == "csv":
+                import pandas as pd  # 仅导出时需要，避免拖慢冷启动
                 df = pd.DataFrame(export_data)
                 df.to_csv(file_path, index=False, encoding='utf-8')
             
             elif format == "excel":
+                import pandas as pd
                 df = pd.DataFrame(export_data)
                 df.to_excel(file_path, index=False, engine='openpyxl')
             
@@ -278,14 +317,21 @@ class CrawlingService:
             logger.error(f"导出数据失败: {e}")
             return {"success": False, "error": str(e)}
     
+    async def iter_session_rows(self, session_id: str,
+                                batch_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """逐行迭代会话的导出数据（服务端游标，按批次拉取）"""
+        stmt = _JOBS_BY_SESSION_STMT.execution_options(yield_per=batch_size)
+        result = await self.db.stream(stmt, {"session_id": session_id})
+        async for job in result.scalars():
+            yield job.to_export_dict()
+    
     async def _get_or_create_site(self, url: str) -> JobSite:
         """获取或创建网站记录"""
         parsed_url = urlparse(url)
         domain = parsed_url.netloc.lower()
         
         # 查询是否已存在
-        stmt = select(JobSite).where(JobSite.domain == domain)
-        result = await self.db.execute(stmt)
+        result = await self.db.execute(SITE_BY_DOMAIN_STMT, {"domain": domain})
         site = result.scalar_one_or_none()
         
         if not site:
@@ -307,12 +353,9 @@ class CrawlingService:
                                            selectors: Dict[str, str]) -> SelectorConfig:
         """获取或创建选择器配置"""
         # 查询是否已有相同的选择器配置
-        stmt = select(SelectorConfig).where(
-            SelectorConfig.site_id == site_id,
-            SelectorConfig.is_active == True
-        ).order_by(SelectorConfig.created_at.desc())
-        
-        result = await self.db.execute(stmt)
+        result = await self.db.execute(
+            _ACTIVE_SELECTOR_CONFIG_STMT, {"site_id": site_id}
+        )
         existing_config = result.scalar_one_or_none()
         
         # 如果存在且选择器相同，直接使用
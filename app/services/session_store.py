@@ -0,0 +1,159 @@
+"""爬虫会话状态存储"""
+
+import time
+from dataclasses import dataclass, field, fields
+from typing import Dict, Any, List, Optional
+import orjson
+from redis.asyncio import Redis as AsyncRedis
+
+from app.database import async_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 仅当会话仍存在时才写入字段，避免已过期的会话被重新创建
+_UPDATE_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+    return 1
+end
+return 0
+"""
+
+
+@dataclass(slots=True)
+class SessionState:
+    """活动会话状态"""
+    status: str
+    start_time: float = 0.0
+    estimated_duration: int = 0
+    progress: Dict[str, Any] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    summary: Optional[Dict[str, Any]] = None
+    export_url: Optional[str] = None
+    finished_at: Optional[float] = None
+
+
+_SESSION_STATE_FIELDS = frozenset(f.name for f in fields(SessionState))
+
+
+class SessionStore:
+    """基于Redis的活动会话存储
+
+    会话状态保存在 ``sess:{session_id}`` 哈希中，字段值统一JSON编码，
+    以便多个Uvicorn worker共享同一份状态。
+    """
+
+    KEY_PREFIX = "sess:"
+    ACTIVE_TTL = 6 * 3600  # 运行中会话的兜底过期时间，防止进程崩溃后残留
+    COMPLETED_TTL = 300  # 会话结束后保留5分钟供状态查询
+
+    def __init__(self, redis: Optional[AsyncRedis] = None):
+        self.redis = redis or async_redis_client
+        self._update_if_exists = self.redis.register_script(_UPDATE_IF_EXISTS_SCRIPT)
+
+    def _key(self, session_id: str) -> str:
+        """生成会话键"""
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, bytes]:
+        """编码哈希字段"""
+        return {key: orjson.dumps(value) for key, value in fields.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[bytes, bytes]) -> Optional[SessionState]:
+        """解码哈希字段（值为JSON bytes，直接交给orjson）"""
+        if not raw:
+            return None
+        decoded = {}
+        for key, value in raw.items():
+            name = key.decode()
+            if name in _SESSION_STATE_FIELDS:
+                decoded[name] = orjson.loads(value)
+        return SessionState(**decoded)
+
+    async def create(self, session_id: str, **fields: Any) -> bool:
+        """创建会话"""
+        key = self._key(session_id)
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset(key, mapping=self._encode(fields))
+            pipe.expire(key, self.ACTIVE_TTL)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"创建会话状态失败 {session_id}: {e}")
+            return False
+
+    async def update(self, session_id: str, **fields: Any) -> bool:
+        """更新会话字段，会话不存在时返回False"""
+        args = [item for pair in self._encode(fields).items() for item in pair]
+        try:
+            return bool(await self._update_if_exists(keys=[self._key(session_id)], args=args))
+        except Exception as e:
+            logger.error(f"更新会话状态失败 {session_id}: {e}")
+            return False
+
+    async def finish(self, session_id: str, **fields: Any) -> bool:
+        """写入终态并设置过期时间（单次往返）"""
+        key = self._key(session_id)
+        fields.setdefault("finished_at", time.time())
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset(key, mapping=self._encode(fields))
+            pipe.expire(key, self.COMPLETED_TTL)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"写入会话终态失败 {session_id}: {e}")
+            return False
+
+    async def get(self, session_id: str) -> Optional[SessionState]:
+        """获取会话"""
+        try:
+            return self._decode(await self.redis.hgetall(self._key(session_id)))
+        except Exception as e:
+            logger.error(f"获取会话状态失败 {session_id}: {e}")
+            return None
+
+    async def get_many(self, session_ids: List[str]) -> Dict[str, SessionState]:
+        """批量获取会话（单次往返）"""
+        if not session_ids:
+            return {}
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for session_id in session_ids:
+                pipe.hgetall(self._key(session_id))
+            raw_results = await pipe.execute()
+        except Exception as e:
+            logger.error(f"批量获取会话状态失败: {e}")
+            return {}
+
+        sessions = {}
+        for session_id, raw in zip(session_ids, raw_results):
+            data = self._decode(raw)
+            if data is not None:
+                sessions[session_id] = data
+        return sessions
+
+    async def expire(self, session_id: str, seconds: int = COMPLETED_TTL) -> bool:
+        """设置会话过期时间"""
+        try:
+            return bool(await self.redis.expire(self._key(session_id), seconds))
+        except Exception as e:
+            logger.error(f"设置会话过期失败 {session_id}: {e}")
+            return False
+
+    async def delete(self, session_id: str) -> bool:
+        """删除会话"""
+        try:
+            return bool(await self.redis.delete(self._key(session_id)))
+        except Exception as e:
+            logger.error(f"删除会话状态失败 {session_id}: {e}")
+            return False
+
+
+# 全局会话存储实例
+session_store = SessionStore()
@@ -0,0 +1,50 @@
+"""分页URL工具"""
+
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+
+def normalize_page_url(url: str) -> str:
+    """标准化分页URL用于去重：去掉锚点，查询参数排序"""
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse(parsed._replace(query=query, fragment=""))
+
+
+def infer_page_url_template(first_url: str, second_url: str) -> Optional[Callable[[int], str]]:
+    """根据第1页与第2页的URL推断页码URL生成函数，无法推断时返回None"""
+    first, second = urlparse(first_url), urlparse(second_url)
+    if (first.scheme, first.netloc) != (second.scheme, second.netloc):
+        return None
+    
+    # 查询参数页码，如 ?page=2
+    if first.path == second.path:
+        first_query = dict(parse_qsl(first.query, keep_blank_values=True))
+        second_query = parse_qsl(second.query, keep_blank_values=True)
+        for index, (key, value) in enumerate(second_query):
+            if value != "2" or first_query.get(key, "1") != "1":
+                continue
+            other_params = dict(second_query[:index] + second_query[index + 1:])
+            if other_params != {k: v for k, v in first_query.items() if k != key}:
+                continue
+            
+            def build_query_url(page_number: int, index=index, key=key) -> str:
+                query = list(second_query)
+                query[index] = (key, str(page_number))
+                return second._replace(query=urlencode(query)).geturl()
+            
+            return build_query_url
+    
+    # 路径页码，如 /jobs/page/2
+    first_parts, second_parts = first.path.split("/"), second.path.split("/")
+    if first.query == second.query and len(first_parts) == len(second_parts):
+        diff = [i for i, (a, b) in enumerate(zip(first_parts, second_parts)) if a != b]
+        if len(diff) == 1 and first_parts[diff[0]] == "1" and second_parts[diff[0]] == "2":
+            def build_path_url(page_number: int, index=diff[0]) -> str:
+                parts = list(second_parts)
+                parts[index] = str(page_number)
+                return second._replace(path="/".join(parts)).geturl()
+            
+            return build_path_url
+    
+    return None
@@ -0,0 +1,43 @@
+"""异步限流器"""
+
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """异步令牌桶限流器
+
+    桶容量为 ``max_rate``，按 ``max_rate / time_period`` 的速率补充令牌，
+    长期平均速率不超过上限。桶初始只有 ``initial_tokens`` 个令牌（默认1个），
+    刚创建时不会一次性放行 ``max_rate`` 个请求；长时间空闲后才允许短时突发。
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 1.0, initial_tokens: float = 1.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._refill_rate = max_rate / time_period
+        self._tokens = float(min(initial_tokens, max_rate))
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """按经过的时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.max_rate, self._tokens + (now - self._last_refill) * self._refill_rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        """获取一个令牌，令牌不足时等待补充"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._refill_rate)
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        return None
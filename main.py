@@ -6,7 +6,7 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from dotenv import load_dotenv
@@ -34,6 +34,10 @@ async def lifespan(app: FastAPI):
         await startup_database()
         logger.info("数据库初始化完成")
         
+        # 创建HTML解析进程池
+        from app.core.ai.page_analyzer import start_parse_pool
+        start_parse_pool()
+        
         # 创建必要的目录
         import os
         os.makedirs(settings.upload_dir, exist_ok=True)
@@ -57,6 +61,13 @@ async def lifespan(app: FastAPI):
         await shutdown_database()
         logger.info("数据库连接已关闭")
         
+        from app.core.ai.page_analyzer import close_openai_client, shutdown_parse_pool
+        await close_openai_client()
+        logger.info("OpenAI客户端已关闭")
+        
+        shutdown_parse_pool()
+        logger.info("HTML解析进程池已关闭")
+        
     except Exception as e:
         logger.error(f"应用关闭异常: {e}")
     
@@ -71,6 +82,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
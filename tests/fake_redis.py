@@ -0,0 +1,123 @@
+"""测试用内存版Redis"""
+
+from typing import Any, Dict, Optional
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+
+def _to_bytes(value: Any) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakePipeline:
+    """记录命令并在execute时依次执行"""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self.redis, f"_{name}")
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        if self.redis.broken:
+            raise RedisConnectionError("redis unavailable")
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands = []
+
+
+class FakeRedis:
+    """内存版Redis：只实现测试用到的命令，键值均为bytes
+
+    ``ttls`` 记录键的过期秒数（不会真正过期），``broken=True`` 时所有命令抛出连接错误。
+    """
+
+    def __init__(self):
+        self.values: Dict[bytes, bytes] = {}
+        self.hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.ttls: Dict[bytes, int] = {}
+        self.broken = False
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self, f"_{name}")
+
+        async def call(*args, **kwargs):
+            if self.broken:
+                raise RedisConnectionError("redis unavailable")
+            return command(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def register_script(self, script: str):
+        async def update_if_exists(keys, args):
+            # 与会话存储的Lua脚本相同：仅当键存在时写入
+            if self.broken:
+                raise RedisConnectionError("redis unavailable")
+            key = _to_bytes(keys[0])
+            if key not in self.hashes:
+                return 0
+            self._hset(key, mapping=dict(zip(args[::2], args[1::2])))
+            return 1
+        return update_if_exists
+
+    def _exists_key(self, key: bytes) -> bool:
+        return key in self.values or key in self.hashes
+
+    def _set(self, key, value, ex: Optional[int] = None) -> bool:
+        key = _to_bytes(key)
+        self.values[key] = _to_bytes(value)
+        if ex is None:
+            self.ttls.pop(key, None)
+        else:
+            self.ttls[key] = ex
+        return True
+
+    def _get(self, key) -> Optional[bytes]:
+        return self.values.get(_to_bytes(key))
+
+    def _incr(self, key) -> int:
+        key = _to_bytes(key)
+        count = int(self.values.get(key, b"0")) + 1
+        self.values[key] = _to_bytes(count)
+        return count
+
+    def _expire(self, key, seconds: int, nx: bool = False) -> bool:
+        key = _to_bytes(key)
+        if not self._exists_key(key) or (nx and key in self.ttls):
+            return False
+        self.ttls[key] = seconds
+        return True
+
+    def _hset(self, name, mapping: Dict[Any, Any]) -> int:
+        bucket = self.hashes.setdefault(_to_bytes(name), {})
+        added = 0
+        for field_name, value in mapping.items():
+            field_name = _to_bytes(field_name)
+            added += field_name not in bucket
+            bucket[field_name] = _to_bytes(value)
+        return added
+
+    def _hgetall(self, name) -> Dict[bytes, bytes]:
+        return dict(self.hashes.get(_to_bytes(name), {}))
+
+    def _delete(self, key) -> int:
+        key = _to_bytes(key)
+        self.ttls.pop(key, None)
+        removed = self.values.pop(key, None) is not None
+        removed |= self.hashes.pop(key, None) is not None
+        return int(removed)
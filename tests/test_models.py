@@ -0,0 +1,134 @@
+"""数据模型测试"""
+
+import uuid
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import CrawlLog, CrawlSession
+from app.models.base import GUID, Base
+from app.models.crawl_log import LogLevel
+
+
+@pytest.fixture
+def db_session():
+    """内存SQLite会话"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+class TestGUID:
+    """GUID类型测试"""
+
+    def test_bind_canonical_string_fast_path(self):
+        """标准格式的UUID字符串原样返回"""
+        value = str(uuid.uuid4())
+        assert GUID().process_bind_param(value, None) is value
+
+    def test_bind_uuid_and_other_string_forms(self):
+        """UUID对象与非标准字符串统一转换为标准格式"""
+        value = uuid.uuid4()
+        guid = GUID()
+
+        assert guid.process_bind_param(value, None) == str(value)
+        assert guid.process_bind_param(value.hex, None) == str(value)
+        assert guid.process_bind_param(None, None) is None
+
+    def test_bind_invalid_string_raises(self):
+        """非法字符串仍然报错"""
+        with pytest.raises(ValueError):
+            GUID().process_bind_param("not-a-uuid", None)
+
+    def test_result_value(self):
+        """默认返回UUID，as_string=True时返回字符串"""
+        value = str(uuid.uuid4())
+
+        assert GUID().process_result_value(value, None) == uuid.UUID(value)
+        assert GUID(as_string=True).process_result_value(value, None) is value
+        assert GUID(as_string=True).process_result_value(None, None) is None
+
+    def test_round_trip(self, db_session):
+        """写入后读取：主键为UUID，as_string外键为字符串"""
+        session_id = uuid.uuid4()
+        db_session.execute(insert(CrawlLog), [
+            {"session_id": session_id, "log_level": LogLevel.ERROR, "message": "失败"}
+        ])
+        db_session.commit()
+
+        log = db_session.scalars(
+            select(CrawlLog).where(CrawlLog.session_id == str(session_id))
+        ).one()
+
+        assert isinstance(log.id, uuid.UUID)
+        assert log.session_id == str(session_id)
+        assert isinstance(log.timestamp, datetime)
+
+
+class TestToDict:
+    """to_dict 测试"""
+
+    def test_columns_precomputed_per_model(self):
+        """每个模型按表列预先生成转换列表"""
+        assert [name for name, _ in CrawlLog._to_dict_cols] == \
+            [column.name for column in CrawlLog.__table__.columns]
+        assert [name for name, _ in CrawlSession._to_dict_cols] == \
+            [column.name for column in CrawlSession.__table__.columns]
+
+    def test_converts_values_by_column_type(self):
+        """时间转为ISO格式，GUID转为字符串，其他值与None保持不变"""
+        log_id, session_id = uuid.uuid4(), uuid.uuid4()
+        timestamp = datetime(2025, 1, 2, 3, 4, 5)
+        log = CrawlLog(
+            id=log_id,
+            session_id=session_id,
+            log_level=LogLevel.INFO,
+            message="消息",
+            timestamp=timestamp,
+            context_data={"page": 1}
+        )
+
+        data = log.to_dict()
+
+        assert data["id"] == str(log_id)
+        assert data["session_id"] == str(session_id)
+        assert data["timestamp"] == timestamp.isoformat()
+        assert data["log_level"] is LogLevel.INFO
+        assert data["context_data"] == {"page": 1}
+        assert data["page_url"] is None
+        assert data["created_at"] is None
+
+
+class TestCrawlLogBulkInsert:
+    """CrawlLog.bulk_insert 测试"""
+
+    @pytest.mark.asyncio
+    async def test_single_insert_statement(self):
+        """所有行通过一条INSERT语句写入"""
+        session = MagicMock(execute=AsyncMock())
+        rows = [
+            {"session_id": str(uuid.uuid4()), "log_level": LogLevel.ERROR, "message": message}
+            for message in ("a", "b")
+        ]
+
+        await CrawlLog.bulk_insert(session, rows)
+
+        session.execute.assert_awaited_once()
+        statement, params = session.execute.await_args.args
+        assert statement.is_insert
+        assert statement.table.name == CrawlLog.__tablename__
+        assert params == rows
+
+    @pytest.mark.asyncio
+    async def test_empty_rows_skip_query(self):
+        """没有日志时不访问数据库"""
+        session = MagicMock(execute=AsyncMock())
+
+        await CrawlLog.bulk_insert(session, [])
+
+        session.execute.assert_not_awaited()
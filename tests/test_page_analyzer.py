@@ -1,5 +1,6 @@
 """页面分析器单元测试"""
 
+import asyncio
 import base64
 import json
 from unittest.mock import AsyncMock, Mock, patch
@@ -7,7 +8,9 @@ from unittest.mock import AsyncMock, Mock, patch
 import pytest
 from bs4 import BeautifulSoup
 
-from app.core.ai.page_analyzer import AIAnalysisResponse, AnalysisResult, PageAnalyzer
+from app.core.ai.page_analyzer import (
+    AIAnalysisResponse, AnalysisResult, PageAnalyzer, get_openai_client
+)
 
 
 class TestPageAnalyzer:
@@ -212,6 +215,15 @@ class TestPageAnalyzer:
         assert len(cleaned) <= 80000 + 50  # 允许截断标记的额外字符
         assert '内容被截断' in cleaned
 
+    def test_clean_html_truncation_matches_full_serialization(self, page_analyzer):
+        """测试提前停止序列化的结果与完整序列化后截断一致"""
+        long_html = '<html><body>' + '<div class="job"><a href="/j">职位 &amp; 公司</a></div>' * 5000 + '</body></html>'
+        expected = BeautifulSoup(long_html, 'lxml').decode(formatter="minimal")[:80000]
+
+        cleaned = page_analyzer._clean_html_for_analysis(long_html)
+
+        assert cleaned == expected + "\n<!-- 内容被截断 -->"
+
     @pytest.mark.asyncio
     async def test_call_openai_analysis_without_screenshot(self, page_analyzer):
         """测试不带截图的OpenAI API调用"""
@@ -250,6 +262,34 @@ class TestPageAnalyzer:
             call_args = mock_create.call_args[1]
             assert len(call_args['messages'][0]['content']) == 2  # 文本 + 图片
             assert call_args['messages'][0]['content'][1]['type'] == 'image_url'
+            assert call_args['messages'][0]['content'][1]['image_url']['url'].startswith(
+                'data:image/png;base64,')
+
+    @pytest.mark.asyncio
+    async def test_call_openai_analysis_with_jpeg_screenshot(self, page_analyzer):
+        """测试JPEG截图使用正确的MIME类型"""
+        jpeg_base64 = base64.b64encode(b"\xff\xd8\xff\xe0" + b"\x00" * 16).decode('ascii')
+        with patch.object(page_analyzer.openai_client.chat.completions, 'create', new_callable=AsyncMock) as mock_create:
+            mock_response = Mock()
+            mock_response.choices = [Mock()]
+            mock_response.choices[0].message.content = '{"test": "response"}'
+            mock_create.return_value = mock_response
+            
+            await page_analyzer._call_openai_analysis("test prompt", screenshot_base64=jpeg_base64)
+            
+            image_url = mock_create.call_args[1]['messages'][0]['content'][1]['image_url']['url']
+            assert image_url == f"data:image/jpeg;base64,{jpeg_base64}"
+
+    def test_openai_client_shared_per_event_loop(self, page_analyzer):
+        """测试同一事件循环内共享客户端，不同事件循环各用独立客户端"""
+        async def get_clients():
+            return get_openai_client(), page_analyzer.openai_client
+
+        first, second = asyncio.run(get_clients())
+        other, _ = asyncio.run(get_clients())
+
+        assert first is second
+        assert other is not first
 
     def test_parse_ai_response_success(self, page_analyzer, mock_ai_response):
         """测试AI响应解析成功"""
@@ -335,7 +375,8 @@ class TestPageAnalyzer:
     def test_extract_common_classes(self, page_analyzer, sample_html):
         """测试常见类名提取"""
         soup = BeautifulSoup(sample_html, 'html.parser')
-        common_classes = page_analyzer._extract_common_classes(soup, top_n=5)
+        _, class_counts = page_analyzer._count_tags_and_classes(soup)
+        common_classes = page_analyzer._top_classes(class_counts, top_n=5)
         
         assert isinstance(common_classes, list)
         assert len(common_classes) <= 5
@@ -344,7 +385,8 @@ class TestPageAnalyzer:
     def test_find_semantic_elements(self, page_analyzer, sample_html):
         """测试语义化元素查找"""
         soup = BeautifulSoup(sample_html, 'html.parser')
-        semantic_elements = page_analyzer._find_semantic_elements(soup)
+        tag_counts, _ = page_analyzer._count_tags_and_classes(soup)
+        semantic_elements = page_analyzer._semantic_counts(tag_counts)
         
         assert semantic_elements["header"] == 1
         assert semantic_elements["main"] == 1
@@ -0,0 +1,59 @@
+"""分页URL工具测试"""
+
+from app.utils.pagination import infer_page_url_template, normalize_page_url
+
+
+class TestNormalizePageUrl:
+    """分页URL标准化测试"""
+
+    def test_sorts_query_and_drops_fragment(self):
+        """查询参数顺序与锚点不影响去重"""
+        assert normalize_page_url("https://a.com/jobs?p=2&city=bj#top") == \
+            normalize_page_url("https://a.com/jobs?city=bj&p=2")
+
+
+class TestInferPageUrlTemplate:
+    """页码URL模板推断测试"""
+
+    def test_query_parameter(self):
+        """?page=2 形式的页码"""
+        template = infer_page_url_template(
+            "https://a.com/jobs?city=bj", "https://a.com/jobs?city=bj&page=2"
+        )
+
+        assert template is not None
+        assert template(5) == "https://a.com/jobs?city=bj&page=5"
+
+    def test_query_parameter_with_explicit_first_page(self):
+        """第1页带 page=1 参数"""
+        template = infer_page_url_template(
+            "https://a.com/jobs?page=1&q=python", "https://a.com/jobs?page=2&q=python"
+        )
+
+        assert template(3) == "https://a.com/jobs?page=3&q=python"
+
+    def test_path_segment(self):
+        """/jobs/page/2 形式的页码"""
+        template = infer_page_url_template(
+            "https://a.com/jobs/page/1", "https://a.com/jobs/page/2"
+        )
+
+        assert template(10) == "https://a.com/jobs/page/10"
+
+    def test_other_parameters_changed(self):
+        """除页码外还有其他参数变化时无法推断"""
+        assert infer_page_url_template(
+            "https://a.com/jobs?city=bj", "https://a.com/jobs?city=sh&page=2"
+        ) is None
+
+    def test_different_host(self):
+        """跨域名的下一页无法推断"""
+        assert infer_page_url_template(
+            "https://a.com/jobs", "https://b.com/jobs?page=2"
+        ) is None
+
+    def test_opaque_cursor(self):
+        """游标分页无法推断"""
+        assert infer_page_url_template(
+            "https://a.com/jobs", "https://a.com/jobs?cursor=abc123"
+        ) is None
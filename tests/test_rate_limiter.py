@@ -0,0 +1,94 @@
+"""异步限流器单元测试"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.utils import rate_limiter
+from app.utils.rate_limiter import AsyncRateLimiter
+
+
+class FakeClock:
+    """可控时钟：sleep只推进时间并记录等待时长"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """替换限流器模块使用的时钟与sleep"""
+    fake = FakeClock()
+    with patch.object(rate_limiter, "time", fake), \
+            patch.object(rate_limiter.asyncio, "sleep", fake.sleep):
+        yield fake
+
+
+class TestAsyncRateLimiter:
+    """AsyncRateLimiter 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_starts_with_single_token(self, clock):
+        """新建的桶只放行一个请求，不会一次性突发max_rate个"""
+        limiter = AsyncRateLimiter(3, 6.0)
+
+        await limiter.acquire()
+        assert clock.sleeps == []
+
+        await limiter.acquire()
+        assert clock.sleeps == [pytest.approx(2.0)]
+
+    @pytest.mark.asyncio
+    async def test_waits_at_steady_rate(self, clock):
+        """令牌耗尽后按 time_period / max_rate 的间隔放行"""
+        limiter = AsyncRateLimiter(3, 6.0, initial_tokens=0)
+
+        for _ in range(3):
+            await limiter.acquire()
+
+        assert clock.sleeps == [pytest.approx(2.0)] * 3
+        assert clock.now == pytest.approx(1006.0)
+
+    @pytest.mark.asyncio
+    async def test_partial_refill_shortens_wait(self, clock):
+        """已补充部分令牌时只等待剩余时间"""
+        limiter = AsyncRateLimiter(3, 6.0, initial_tokens=0)
+        clock.now += 0.5
+
+        await limiter.acquire()
+
+        assert clock.sleeps == [pytest.approx(1.5)]
+
+    @pytest.mark.asyncio
+    async def test_burst_after_idle_is_capped(self, clock):
+        """空闲后最多突发max_rate个请求，随后恢复等待"""
+        limiter = AsyncRateLimiter(3, 6.0)
+        await limiter.acquire()
+        clock.now += 60.0  # 空闲远超一个周期，令牌数也不超过桶容量
+
+        for _ in range(3):
+            await limiter.acquire()
+        assert clock.sleeps == []
+
+        await limiter.acquire()
+        assert clock.sleeps == [pytest.approx(2.0)]
+
+    @pytest.mark.asyncio
+    async def test_context_manager_acquires(self, clock):
+        """async with 进入时获取令牌"""
+        limiter = AsyncRateLimiter(1, 1.0)
+
+        async with limiter:
+            pass
+        async with limiter:
+            pass
+
+        assert clock.sleeps == [pytest.approx(1.0)]